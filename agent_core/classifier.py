@@ -2,13 +2,17 @@
 
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.pydantic_v1 import BaseModel, Field
+from pydantic import BaseModel, Field
 from typing import Optional
+from tools import tracing
+
+# Logger em que o ChatGoogleGenerativeAI anuncia as novas tentativas feitas internamente.
+GEMINI_RETRY_LOGGER = "langchain_google_genai.chat_models"
 
 # A definição da classe de saída permanece a mesma
 class SubjectTopicOutput(BaseModel):
-    materia: Optional[str] = Field(description="A matéria principal do texto, ex: 'Matemática', 'História do Brasil', 'Direito Constitucional'")
-    assunto: Optional[str] = Field(description="O assunto específico dentro da matéria, ex: 'Juros Compostos', 'Primeira República', 'Artigo 5 da Constituição'")
+    materia: Optional[str] = Field(default=None, description="A matéria principal do texto, ex: 'Matemática', 'História do Brasil', 'Direito Constitucional'")
+    assunto: Optional[str] = Field(default=None, description="O assunto específico dentro da matéria, ex: 'Juros Compostos', 'Primeira República', 'Artigo 5 da Constituição'")
     relevante: bool = Field(description="True se o texto contém uma questão ou conteúdo de estudo, False se for uma capa, índice ou página em branco.")
 
 class TopicClassifier:
@@ -24,7 +28,8 @@ class TopicClassifier:
         
         self.llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=api_key, temperature=0.0)
 
-        structured_llm = self.llm.with_structured_output(SubjectTopicOutput)
+        # include_raw=True preserva a mensagem original, de onde vem a contagem de tokens.
+        structured_llm = self.llm.with_structured_output(SubjectTopicOutput, include_raw=True)
         
         self.chain = prompt | structured_llm
         
@@ -32,9 +37,18 @@ class TopicClassifier:
         """
         Classifica um único chunk de texto.
         """
-        try:
-            # A chamada para a chain também fica mais limpa.
-            return self.chain.invoke({"text_chunk": text_chunk})
-        except Exception as e:
-            print(f"⚠️ Erro de classificação: {e}")
-            return None
\ No newline at end of file
+        with tracing.span("gemini.classify", category="call", prompt_chars=len(text_chunk)) as call_span:
+            try:
+                with tracing.count_retries(call_span, GEMINI_RETRY_LOGGER):
+                    result = self.chain.invoke({"text_chunk": text_chunk})
+                tracing.record_llm_usage(call_span, result.get("raw"))
+                if result.get("parsing_error") is not None:
+                    # Resposta fora do esquema: registra o erro no span e descarta o chunk.
+                    print(f"⚠️ Erro de classificação: {result['parsing_error']}")
+                    call_span.set(error=str(result["parsing_error"]))
+                    return None
+                return result.get("parsed")
+            except Exception as e:
+                print(f"⚠️ Erro de classificação: {e}")
+                call_span.set(error=str(e))
+                return None
\ No newline at end of file
@@ -6,8 +6,15 @@ from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 import json
 
 class ConversationalPlanner:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, question_search=None):
+        """
+        Args:
+            api_key (str): A chave de API para o Google Gemini.
+            question_search: Função opcional que recebe a mensagem do usuário e retorna um
+                texto curto com as questões mais relacionadas (ex: PlannerOrchestrator.describe_relevant_questions).
+        """
         self.llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=api_key, temperature=0.7)
+        self.question_search = question_search
         self.history = []
 
     def start_conversation(self, topics_summary: str, schedule_summary: str):
@@ -48,9 +55,16 @@ class ConversationalPlanner:
 
     def chat(self, user_input: str):
         """ Continua a conversa com a entrada do usuário. """
-        self.history.append(HumanMessage(content=user_input))
+        content = user_input
+        # Anexa apenas as poucas questões do material mais relacionadas ao pedido do usuário.
+        # Elas vão só na chamada atual; o histórico guarda a mensagem original, para não crescer a cada turno.
+        if self.question_search:
+            related_questions = self.question_search(user_input)
+            if related_questions:
+                content += f"\n\n(Questões do material relacionadas a esta mensagem, encontradas automaticamente:\n{related_questions})"
         
-        response = self.llm.invoke(self.history)
+        response = self.llm.invoke(self.history + [HumanMessage(content=content)])
+        self.history.append(HumanMessage(content=user_input))
         self.history.append(response)
         
         print(f"\n--- 🤖 Assistente de Estudos ---\n{response.content}")
@@ -1,15 +1,18 @@
 # agent_core/orchestrator.py (versão final consolidada)
 
-import datetime as dt
+import os
+from array import array
 from collections import defaultdict
 from tqdm import tqdm
-from langchain_core.prompts import ChatPromptTemplate
 import re	
-# Importa as ferramentas e classificadores necessários de outros módulos do projeto
-from agent_core.classifier import TopicClassifier
-from tools.pdf_processor import extract_chunks_from_pdfs
-from tools.pdf_generator import create_topic_pdf
+# Importa as ferramentas necessárias de outros módulos do projeto.
+# LangChain, pypdf e ReportLab são importados apenas na fase que os utiliza,
+# para que o agendamento e os utilitários não paguem o custo de importação.
 from tools.google_calendar import CalendarManager
+from tools.corpus_store import CorpusStore
+from tools.question_index import QuestionIndex, tokenize
+from tools.naming import topic_pdf_filename
+from tools import tracing
 
 class PlannerOrchestrator:
     """
@@ -21,33 +24,130 @@ class PlannerOrchestrator:
     5. Agenda os estudos no Google Calendar com base nas preferências do usuário.
     6. Verifica se o agendamento foi bem-sucedido.
     """
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, render_workers: int = 0, study_book_name: str = None, corpus_folder: str = "corpus",
+                 max_explanation_questions: int = 8):
         """
         Inicializa o orquestrador com o classificador de tópicos.
         
         Args:
             api_key (str): A chave de API para o Google Gemini.
+            render_workers (int): Número de processos para renderizar os PDFs em paralelo
+                enquanto as próximas explicações são geradas (0 = no processo atual).
+            study_book_name (str): Se informado, também gera um caderno único com todos
+                os tópicos, sumário e marcadores, com este nome na pasta de saída.
+            corpus_folder (str): Pasta do CorpusStore onde o texto das páginas é guardado.
+            max_explanation_questions (int): Máximo de questões representativas enviadas à IA
+                para gerar a explicação de cada assunto.
         """
-        self.classifier = TopicClassifier(api_key=api_key)
-        self.grouped_topics = defaultdict(lambda: defaultdict(list))
+        self.api_key = api_key
+        self.render_workers = render_workers
+        self.study_book_name = study_book_name
+        self.corpus_folder = corpus_folder
+        self.corpus = None
+        self.question_index = None
+        self.max_explanation_questions = max_explanation_questions
+        self._classifier = None
+        # materia -> assunto -> ids das páginas no corpus
+        self.grouped_topics = defaultdict(lambda: defaultdict(lambda: array('I')))
         self.topic_files_for_scheduling = []
 
-    def _generate_topic_explanation(self, materia: str, assunto: str, chunks: list) -> str:
+    @property
+    def classifier(self):
+        """Cria o classificador (e carrega o LangChain) apenas no primeiro uso."""
+        if self._classifier is None:
+            from agent_core.classifier import TopicClassifier
+            self._classifier = TopicClassifier(api_key=self.api_key)
+        return self._classifier
+
+    def search_questions(self, query: str, k: int = 5, chunk_ids=None) -> list:
+        """
+        Busca no índice as questões mais relevantes para uma consulta em texto livre.
+
+        Args:
+            query (str): A consulta, ex: "só SQL e normalização".
+            k (int): Quantidade máxima de resultados.
+            chunk_ids: Se informado, restringe a busca a estes ids do corpus.
+
+        Returns:
+            list: Pares (id da página, pontuação BM25), do mais relevante para o menos.
+        """
+        if self.question_index is None:
+            return []
+        candidates = set(chunk_ids) if chunk_ids is not None else None
+        with tracing.span("index.search", category="call", k=k) as call_span:
+            hits = self.question_index.search(query, k=k, candidates=candidates)
+            call_span.set(hits=len(hits))
+        return hits
+
+    def describe_relevant_questions(self, query: str, k: int = 3, snippet_chars: int = 200, min_score: float = 1.0) -> str:
+        """
+        Texto curto com as questões mais relacionadas à consulta, para dar contexto
+        ao ConversationalPlanner sem enviar listas inteiras de assuntos.
+        Resultados com pontuação abaixo de `min_score` são descartados, de modo que
+        mensagens como "ok" ou "sim" não trazem questões.
+        """
+        lines = []
+        for page_id, score in self.search_questions(query, k=k):
+            if score < min_score:
+                break
+            materia, assunto = self.corpus.label(page_id)
+            snippet = " ".join(self.corpus.text(page_id).split())[:snippet_chars]
+            lines.append(f"- [{materia} - {assunto}] {self.corpus.header(page_id)}: {snippet}...")
+        return "\n".join(lines)
+
+    def _representative_questions(self, chunk_ids, max_similarity: float = 0.6) -> list:
+        """
+        Escolhe até `max_explanation_questions` páginas que representam o assunto.
+
+        Os termos centrais do assunto (frequentes nas suas páginas e raros no resto do
+        material) formam a consulta, e as páginas são ordenadas pela pontuação BM25
+        contra ela. Páginas quase iguais a uma já escolhida (mesma questão em provas
+        diferentes) são deixadas para o fim, para variar o conjunto enviado à IA.
+        """
+        limit = self.max_explanation_questions
+        if len(chunk_ids) <= limit:
+            return list(chunk_ids)
+
+        page_terms = {page_id: tokenize(self.corpus.text(page_id)) for page_id in chunk_ids}
+        centroid = self.question_index.centroid_terms(page_terms.values())
+        with tracing.span("index.representatives", category="call", questions=len(chunk_ids)):
+            hits = self.question_index.search_terms(centroid, k=len(chunk_ids), candidates=set(page_terms))
+        ranked = [page_id for page_id, _ in hits]
+        ranked_set = set(ranked)
+        ranked += [page_id for page_id in chunk_ids if page_id not in ranked_set]
+
+        selected, similar, selected_terms = [], [], []
+        for page_id in ranked:
+            terms = set(page_terms[page_id])
+            if any(len(terms & other) / (len(terms | other) or 1) >= max_similarity for other in selected_terms):
+                similar.append(page_id)
+                continue
+            selected.append(page_id)
+            selected_terms.append(terms)
+            if len(selected) == limit:
+                return selected
+        return selected + similar[:limit - len(selected)]
+
+    def _generate_topic_explanation(self, materia: str, assunto: str, chunk_ids) -> str:
         """
         Usa a LLM para gerar uma explicação teórica concisa baseada nas questões.
         
         Args:
             materia (str): O nome da matéria.
             assunto (str): O nome do assunto.
-            chunks (list): A lista de textos das questões relacionadas.
+            chunk_ids: Os ids, no corpus, das páginas com as questões relacionadas.
 
         Returns:
             str: Um texto contendo a explicação teórica gerada pela IA.
         """
+        from langchain_core.prompts import ChatPromptTemplate
+        from agent_core.classifier import GEMINI_RETRY_LOGGER
+
         print(f"🧠 Gerando explicação para o tópico: {materia} - {assunto}...")
         
-        # Concatena todas as questões em um único texto para dar contexto à IA
-        all_questions_text = "\n\n---\n\n".join(chunks)
+        # Concatena as questões representativas em um único texto para dar contexto à IA
+        question_ids = self._representative_questions(chunk_ids)
+        all_questions_text = "\n\n---\n\n".join(self.corpus.chunk(i) for i in question_ids)
 
         # Cria um prompt bem definido para instruir a IA
         prompt_template = ChatPromptTemplate.from_messages([
@@ -70,11 +170,14 @@ class PlannerOrchestrator:
         explanation_chain = prompt_template | self.classifier.llm
         
         try:
-            response = explanation_chain.invoke({
-                "assunto": assunto,
-                "materia": materia,
-                "questions": all_questions_text
-            })
+            with tracing.span("gemini.explain", category="call", prompt_chars=len(all_questions_text)) as call_span:
+                with tracing.count_retries(call_span, GEMINI_RETRY_LOGGER):
+                    response = explanation_chain.invoke({
+                        "assunto": assunto,
+                        "materia": materia,
+                        "questions": all_questions_text
+                    })
+                tracing.record_llm_usage(call_span, response)
             
             # --- CONVERSÃO DE MARKDOWN PARA TAGS HTML ---
             markdown_text = response.content
@@ -93,41 +196,140 @@ class PlannerOrchestrator:
         Executa a fase de análise: lê, classifica, gera explicações e cria os PDFs.
         Retorna um resumo textual do que foi encontrado para ser usado na conversa.
         """
-        # Fase 1: Leitura e extração do texto dos PDFs
-        text_chunks = extract_chunks_from_pdfs(input_folder)
+        try:
+            return self._run_analysis(input_folder, output_folder)
+        finally:
+            # Encerra a escrita do corpus (arquivo de acréscimos e mapeamento em memória).
+            # A busca usada na conversa o reabre apenas para leitura.
+            if self.corpus is not None:
+                self.corpus.close()
+                self.corpus = CorpusStore(self.corpus_folder, readonly=True)
+
+    def close(self):
+        """Libera o corpus aberto pelo orquestrador."""
+        if self.corpus is not None:
+            self.corpus.close()
+            self.corpus = None
+
+    def _run_analysis(self, input_folder: str, output_folder: str) -> str:
+        from tools.pdf_processor import extract_pages_from_pdfs
+        from tools.pdf_generator import TopicPdfRenderer, create_render_pool, render_topic_in_worker
+
+        # Fase 1: Leitura e extração do texto dos PDFs para o corpus
+        self.corpus = CorpusStore(self.corpus_folder, reset=True)
+        self.question_index = QuestionIndex(self.corpus_folder, reset=True)
+        with tracing.span("extract_pdfs") as stage:
+            page_ids = extract_pages_from_pdfs(input_folder, self.corpus)
+            stage.set(chunks=len(page_ids))
         
         # Fase 2: Classificação de cada página usando a IA
         print("\n🧠 Classificando conteúdo com o agente de IA...")
-        for chunk in tqdm(text_chunks, desc="Classificando Chunks"):
-            classification = self.classifier.classify_chunk(chunk)
-            # Agrupa apenas se a classificação for bem-sucedida e relevante
-            if classification and classification.relevante and classification.materia and classification.assunto:
-                self.grouped_topics[classification.materia][classification.assunto].append(chunk)
+        with tracing.span("classify_chunks", chunks=len(page_ids)) as stage:
+            for page_id in tqdm(page_ids, desc="Classificando Chunks"):
+                classification = self.classifier.classify_chunk(self.corpus.chunk(page_id))
+                # Agrupa apenas se a classificação for bem-sucedida e relevante
+                if classification and classification.relevante and classification.materia and classification.assunto:
+                    self.corpus.set_label(page_id, classification.materia, classification.assunto)
+                    self.grouped_topics[classification.materia][classification.assunto].append(page_id)
+                    self.question_index.add_document(page_id, self.corpus.text(page_id))
+                    stage.incr("relevant")
+        # Salva o corpus e o índice de questões para que os processos de renderização
+        # e o --dry-run offline possam lê-los
+        self.corpus.save()
+        self.question_index.save()
 
         if not self.grouped_topics:
             return "❌ Nenhum conteúdo relevante foi classificado. Encerrando."
 
         # Fase 3: Geração das explicações e dos PDFs de estudo
         print("\n📄 Gerando explicações e PDFs de estudo por assunto...")
-        for materia, assuntos in tqdm(self.grouped_topics.items(), desc="Gerando Explicações e PDFs"):
-            for assunto, chunks in assuntos.items():
-                # Gera a explicação teórica para o grupo de questões
-                explanation = self._generate_topic_explanation(materia, assunto, chunks)
-                # Cria o PDF, passando a explicação e as questões
-                pdf_filename = create_topic_pdf(materia, assunto, explanation, chunks, output_folder)
-                
-                # Armazena informações sobre o PDF gerado para o agendamento posterior
-                self.topic_files_for_scheduling.append({
-                    "materia": materia,
-                    "assunto": assunto,
-                    "filename": pdf_filename,
-                    "count": len(chunks)
-                })
-        
+        renderer = TopicPdfRenderer(output_folder, self.corpus)
+        pool = create_render_pool(output_folder, self.corpus_folder, self.render_workers) if self.render_workers > 0 else None
+        # O caderno único é desenhado tópico a tópico, à medida que as explicações ficam prontas
+        book = self._open_study_book(output_folder, renderer) if self.study_book_name else None
+        rendered = []
+        try:
+            with tracing.span("generate_topics", render_workers=self.render_workers):
+                for materia, assuntos in tqdm(self.grouped_topics.items(), desc="Gerando Explicações e PDFs"):
+                    for assunto, chunks in assuntos.items():
+                        with tracing.span(f"{materia} - {assunto}", category="topic", questions=len(chunks)) as topic_span:
+                            # Gera a explicação teórica para o grupo de questões
+                            explanation = self._generate_topic_explanation(materia, assunto, chunks)
+                            # Cria o PDF, passando a explicação e as questões. Com o pool, a renderização
+                            # acontece em outro processo enquanto a próxima explicação é gerada.
+                            if pool:
+                                result = pool.submit(render_topic_in_worker, materia, assunto, explanation, chunks)
+                            else:
+                                result = renderer.render(materia, assunto, explanation, chunks)
+                        rendered.append((materia, assunto, len(chunks), result, topic_span))
+                        if book:
+                            with tracing.span("study_book.add_topic", category="call", topic=f"{materia} - {assunto}"):
+                                book.add_topic(materia, assunto, explanation, chunks)
+
+                for materia, assunto, count, result, topic_span in rendered:
+                    if pool:
+                        # Junta ao trace os spans do processo de renderização, somando o tempo
+                        # de renderização ao tópico, como acontece sem o pool
+                        pdf_filename, worker_spans = result.result()
+                        tracing.merge_spans(worker_spans, into=topic_span)
+                    else:
+                        pdf_filename = result
+                    # Armazena informações sobre o PDF gerado para o agendamento posterior
+                    self.topic_files_for_scheduling.append({
+                        "materia": materia,
+                        "assunto": assunto,
+                        "filename": pdf_filename,
+                        "count": count
+                    })
+
+            if book:
+                print(f"\n📚 Montando o caderno de estudos em: {book.filepath}...")
+                with tracing.span("write_study_book", topics=len(rendered)):
+                    book.close()
+                book = None
+        finally:
+            if pool:
+                pool.shutdown()
+            if book:
+                book.discard()
+
         # Fase 4: Criação do resumo estatístico
         summary = self._generate_summary()
         return summary
 
+    def load_classified_topics(self) -> int:
+        """
+        Recarrega os assuntos classificados em uma execução anterior a partir do corpus
+        salvo, sem ler os PDFs nem chamar a IA. O corpus fica aberto apenas para leitura
+        e o índice de questões salvo é carregado, de modo que search_questions() e
+        describe_relevant_questions() funcionam offline. Usado pelo modo de simulação offline.
+
+        Returns:
+            int: O número de assuntos encontrados (0 se não houver corpus salvo).
+        """
+        if not os.path.exists(os.path.join(self.corpus_folder, 'meta.json')):
+            return 0
+        self.close()
+        self.corpus = CorpusStore(self.corpus_folder, readonly=True)
+        self.question_index = QuestionIndex(self.corpus_folder)
+        for page_id in range(len(self.corpus)):
+            label = self.corpus.label(page_id)
+            if label is not None:
+                self.grouped_topics[label[0]][label[1]].append(page_id)
+
+        self.topic_files_for_scheduling = [
+            {"materia": materia, "assunto": assunto, "filename": topic_pdf_filename(materia, assunto), "count": len(chunks)}
+            for materia, assuntos in self.grouped_topics.items()
+            for assunto, chunks in assuntos.items()
+        ]
+        return len(self.topic_files_for_scheduling)
+
+    def _open_study_book(self, output_folder: str, renderer):
+        """Abre o caderno único, que recebe os tópicos conforme são gerados."""
+        from tools.pdf_generator import StudyBookWriter
+
+        return StudyBookWriter(os.path.join(output_folder, self.study_book_name), renderer)
+
     def _generate_summary(self) -> str:
         """Cria uma string formatada com as estatísticas do conteúdo analisado."""
         num_materias = len(self.grouped_topics)
@@ -150,52 +352,48 @@ class PlannerOrchestrator:
         summary_str += "="*50 + "\n"
         return summary_str
 
-    def schedule_with_preferences(self, preferences: dict):
+    def schedule_with_preferences(self, preferences: dict, dry_run: bool = False, ics_path: str = None) -> list:
         """
-        Executa a fase de agendamento, criando e verificando os eventos no Google Calendar.
+        Executa a fase de agendamento: calcula o cronograma completo com o StudyScheduler
+        e cria os eventos no Google Calendar em lote.
         
         Args:
             preferences (dict): Um dicionário com as preferências coletadas do usuário.
+            dry_run (bool): Se True, apenas calcula e mostra o cronograma, sem acessar o Google Calendar.
+            ics_path (str): Se informado, exporta o cronograma para este arquivo .ics.
+
+        Returns:
+            list: As sessões planejadas (StudySession).
         """
-        calendar_manager = CalendarManager()
-        print("\n📅 Criando cronograma personalizado e agendando no Google Calendar...")
-        
-        # Ordena os tópicos, colocando os priorizados primeiro
-        study_items = sorted(
-            self.topic_files_for_scheduling,
-            key=lambda x: (
-                x['materia'] not in preferences.get('priorities', []) and x['assunto'] not in preferences.get('priorities', []),
-                -x['count'] # Desempate por número de questões
-            )
-        )
-        
-        allowed_weekdays = preferences['study_days']
-        study_date = dt.datetime.strptime(preferences['start_date'], '%Y-%m-%d')
-        time_parts = list(map(int, preferences['study_time'].split(':')))
-        
-        expected_events_to_verify = []
-        topics_scheduled_today = 0
-        
-        # Itera sobre os tópicos e cria os eventos
-        for item in tqdm(study_items, desc="Agendando Eventos"):
-            # Encontra o próximo dia de estudo permitido
-            while study_date.weekday() not in allowed_weekdays or topics_scheduled_today >= preferences['topics_per_day']:
-                study_date += dt.timedelta(days=1)
-                topics_scheduled_today = 0
-            
-            event_datetime = study_date.replace(hour=time_parts[0], minute=time_parts[1], second=0)
-            
-            summary = f"Estudar: {item['materia']} - {item['assunto']}"
-            description = f"Foco do dia: Revisar as questões e a teoria do arquivo '{item['filename']}'.\nEste assunto apareceu {item['count']} vez(es) nas provas analisadas."
-            
-            # Adiciona o evento à lista de verificação antes de criá-lo
-            expected_events_to_verify.append({
-                'summary': summary,
-                'start_datetime': event_datetime
-            })
-            
-            calendar_manager.create_study_event(summary, description, event_datetime)
-            topics_scheduled_today += 1
+        from tools.study_scheduler import StudyScheduler, format_plan, write_ics
+
+        print("\n📅 Criando cronograma personalizado...")
+        scheduler = StudyScheduler.from_preferences(preferences)
+
+        calendar_manager = None
+        if not dry_run:
+            with tracing.span("calendar_auth"):
+                calendar_manager = CalendarManager()
+            # Evita os horários já ocupados na agenda durante todo o período do cronograma.
+            horizon = scheduler.horizon_days(len(self.topic_files_for_scheduling))
+            scheduler.add_busy_slots(calendar_manager.get_busy_slots(scheduler.start_date, horizon))
+
+        sessions = scheduler.plan(self.topic_files_for_scheduling)
+        print(format_plan(sessions))
+
+        if ics_path:
+            write_ics(sessions, ics_path)
+            print(f"🗓️ Cronograma exportado para: {ics_path}")
+
+        if dry_run:
+            print("🧪 Modo de simulação: nenhum evento foi criado no Google Calendar.")
+            return sessions
+
+        print("\n📅 Agendando no Google Calendar...")
+        with tracing.span("schedule_events", events=len(sessions)):
+            created = calendar_manager.create_study_events(sessions)
+        print(f"✅ {created} de {len(sessions)} eventos criados.")
 
         # Etapa final de verificação para garantir que os eventos foram criados.
-        #calendar_manager.verify_events_creation(expected_events_to_verify)
+        #calendar_manager.verify_events_creation([{'summary': s.summary, 'start_datetime': s.start} for s in sessions])
+        return sessions
@@ -1,35 +1,6 @@
-import os
 import datetime as dt
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from tqdm import tqdm
-
-# Configurações
-SCOPES = ['https://www.googleapis.com/auth/calendar']
-CREDENTIALS_FILE = 'config/credentials.json'
-TOKEN_FILE = 'config/token.json'
-
-def authenticate():
-    """
-    Realiza a autenticação interativa do usuário, reutilizando o token se existir.
-    """
-    creds = None
-    if os.path.exists(TOKEN_FILE):
-        creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
-    
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_FILE, SCOPES)
-            creds = flow.run_local_server(port=0)
-        
-        with open(TOKEN_FILE, 'w') as token:
-            token.write(creds.to_json())
-    
-    return build('calendar', 'v3', credentials=creds)
+from tools.google_calendar import get_calendar_service
 
 def main():
     """
@@ -38,7 +9,7 @@ def main():
     print("--- Script de Limpeza de Eventos do Google Calendar (Modo credentials.json) ---")
 
     try:
-        service = authenticate()
+        service = get_calendar_service()
     except Exception as e:
         print(f"❌ Erro de autenticação: {e}")
         print("Verifique se o arquivo 'config/credentials.json' está correto e se o fluxo de autorização no navegador foi concluído.")
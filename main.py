@@ -1,19 +1,136 @@
 
+import time
+_PROCESS_START = time.perf_counter()
+
 import os
+import json
+import argparse
+import importlib
 import datetime as dt
 from dotenv import load_dotenv
 from agent_core.orchestrator import PlannerOrchestrator
-from agent_core.conversational_planner import ConversationalPlanner
 from tools.google_calendar import CalendarManager
+from tools import tracing
+
+TRACE_FOLDER = "traces"
+STUDY_BOOK_NAME = "Caderno_de_Estudos.pdf"
+ICS_NAME = "cronograma.ics"
+INPUT_FOLDER = "input_proofs"
+OUTPUT_FOLDER = "output_topics"
+CORPUS_FOLDER = "corpus"
+
+# Módulos pesados de cada fase, importados sob demanda. Usados também pelo modo --startup-time.
+STARTUP_PHASES = [
+    ("Leitura de PDFs (pypdf)", "tools.pdf_processor"),
+    ("Classificação (LangChain + Gemini)", "agent_core.classifier"),
+    ("Geração de PDFs (ReportLab)", "tools.pdf_generator"),
+    ("Conversa com o planejador", "agent_core.conversational_planner"),
+    ("Google Calendar (googleapiclient)", "googleapiclient.discovery"),
+]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Agente organizador de estudos.")
+    parser.add_argument("--trace", action="store_true",
+                        help="Registra o tempo de cada etapa e chamada externa e exporta um trace JSON ao final.")
+    parser.add_argument("--startup-time", action="store_true",
+                        help="Mede o tempo de inicialização e de importação de cada fase, sem executar o agente.")
+    parser.add_argument("--render-workers", type=int, default=0,
+                        help="Número de processos para renderizar os PDFs em paralelo (padrão: 0, no processo principal).")
+    parser.add_argument("--study-book", action="store_true",
+                        help="Gera também um caderno único com todos os tópicos, sumário e marcadores.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Calcula o cronograma sem acessar o Google Calendar e o exporta em .ics.")
+    parser.add_argument("--ics", metavar="ARQUIVO",
+                        help=f"Exporta o cronograma para um arquivo .ics (padrão no --dry-run: {OUTPUT_FOLDER}/{ICS_NAME}).")
+    parser.add_argument("--preferences", metavar="ARQUIVO",
+                        help="Com --dry-run, lê as preferências de um JSON e planeja a partir dos assuntos já "
+                             "classificados em corpus/, sem chave de API, IA ou Google Calendar.")
+    return parser.parse_args()
+
+def measure_startup():
+    """
+    Mostra quanto tempo o processo leva para ficar pronto e quanto cada fase
+    acrescenta ao importar suas dependências. Não acessa rede nem credenciais.
+    """
+    ready = time.perf_counter() - _PROCESS_START
+    print("="*50)
+    print("⏱️  TEMPO DE INICIALIZAÇÃO ⏱️")
+    print("="*50)
+    print(f"  {ready:>8.3f}s  main.py pronto (imports essenciais)")
+    total = ready
+    for label, module_name in STARTUP_PHASES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(module_name)
+            status = ""
+        except ImportError as e:
+            status = f"  (indisponível: {e})"
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        print(f"  {elapsed:>8.3f}s  + {label}{status}")
+    print(f"  {total:>8.3f}s  total com todas as fases carregadas")
+    print("Obs.: dependências compartilhadas são contadas na primeira fase que as importa.")
+    print("="*50)
 
 def main():
+    args = parse_args()
+    if args.startup_time:
+        measure_startup()
+        return
+
     load_dotenv(dotenv_path=os.path.join('config', '.env'))
+
+    # A instrumentação pode ser ligada pela linha de comando ou pela variável STUDY_AGENT_TRACE.
+    if args.trace or os.getenv("STUDY_AGENT_TRACE", "").lower() in ("1", "true", "yes"):
+        tracing.enable()
+
+    try:
+        run_agent(args)
+    finally:
+        if tracing.is_enabled():
+            print(tracing.format_summary())
+            trace_path = tracing.export_trace(TRACE_FOLDER)
+            print(f"📊 Trace da execução salvo em: {trace_path}")
+
+def plan_offline(args):
+    """
+    Simulação sem credenciais: usa os assuntos classificados na última execução
+    (salvos em corpus/) e as preferências do arquivo JSON, no mesmo formato
+    produzido pelo ConversationalPlanner. O índice de questões salvo mostra as
+    questões ligadas a cada prioridade.
+    """
+    with open(args.preferences, encoding='utf-8') as f:
+        preferences = json.load(f)
+    if not preferences.get('start_date'):
+        preferences['start_date'] = dt.date.today().strftime('%Y-%m-%d')
+
+    orchestrator = PlannerOrchestrator(api_key=None, corpus_folder=CORPUS_FOLDER)
+    try:
+        if not orchestrator.load_classified_topics():
+            print(f"❌ Nenhum assunto classificado em '{CORPUS_FOLDER}/'. Execute o agente completo uma vez antes da simulação offline.")
+            return
+
+        # Mostra, pelo índice salvo, as questões do material ligadas a cada prioridade informada
+        for priority in preferences.get('priorities', []):
+            related = orchestrator.describe_relevant_questions(priority)
+            print(f"\n🔎 Questões relacionadas à prioridade '{priority}':\n{related or '  (nenhuma questão encontrada no material)'}")
+
+        os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+        ics_path = args.ics or os.path.join(OUTPUT_FOLDER, ICS_NAME)
+        orchestrator.schedule_with_preferences(preferences, dry_run=True, ics_path=ics_path)
+    finally:
+        orchestrator.close()
+
+def run_agent(args):
+    if args.dry_run and args.preferences:
+        plan_offline(args)
+        return
+
     API_KEY = os.getenv("GOOGLE_API_KEY")
     if not API_KEY:
-        raise ValueError("A chave de API do Google não foi encontrada.")
+        raise ValueError("A chave de API do Google não foi encontrada. "
+                         "Para simular o cronograma sem credenciais, use --dry-run --preferences ARQUIVO.")
 
-    INPUT_FOLDER = "input_proofs"
-    OUTPUT_FOLDER = "output_topics"
     os.makedirs(INPUT_FOLDER, exist_ok=True)
     os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
@@ -22,46 +139,61 @@ def main():
     print("="*50)
 
     # --- FASE 1: Análise de Conteúdo e Agenda ---
-    orchestrator = PlannerOrchestrator(api_key=API_KEY)
+    orchestrator = PlannerOrchestrator(
+        api_key=API_KEY,
+        render_workers=args.render_workers,
+        study_book_name=STUDY_BOOK_NAME if args.study_book else None,
+        corpus_folder=CORPUS_FOLDER
+    )
     topics_summary = orchestrator.analyze_and_generate_pdfs(INPUT_FOLDER, OUTPUT_FOLDER)
     
     if "❌" in topics_summary:
         print(topics_summary)
         return
 
-    calendar_manager = CalendarManager()
-    schedule_summary = calendar_manager.analyze_schedule_for_llm(dt.date.today())
+    if args.dry_run:
+        schedule_summary = "A agenda não foi consultada (modo de simulação). Considere todos os horários como livres."
+    else:
+        with tracing.span("analyze_schedule"):
+            calendar_manager = CalendarManager()
+            schedule_summary = calendar_manager.analyze_schedule_for_llm(dt.date.today())
 
-    # --- FASE 2: Conversa com o Agente de Planejamento ---
-    planner_agent = ConversationalPlanner(api_key=API_KEY)
-    planner_agent.start_conversation(topics_summary, schedule_summary)
+    try:
+        # --- FASE 2: Conversa com o Agente de Planejamento ---
+        from agent_core.conversational_planner import ConversationalPlanner
+        planner_agent = ConversationalPlanner(api_key=API_KEY, question_search=orchestrator.describe_relevant_questions)
+        with tracing.span("start_conversation"):
+            planner_agent.start_conversation(topics_summary, schedule_summary)
 
-    while True:
-        user_input = input("\n--- Você ---\n")
+        while True:
+            user_input = input("\n--- Você ---\n")
         
-        if user_input.lower() in ['sair', 'exit', 'quit']:
-            print("Até mais!")
-            break
+            if user_input.lower() in ['sair', 'exit', 'quit']:
+                print("Até mais!")
+                break
             
-        planner_agent.chat(user_input)
+            planner_agent.chat(user_input)
         
-        final_preferences = planner_agent.is_plan_finalized()
+            final_preferences = planner_agent.is_plan_finalized()
         
-        if final_preferences:
-            # Verifica se a data de início existe e, se não, usa a data de hoje como padrão.
-            if not final_preferences.get('start_date'):
-                today_str = dt.date.today().strftime('%Y-%m-%d')
-                print(f"⚠️ Data de início não foi especificada na conversa. Usando a data de hoje: {today_str}")
-                final_preferences['start_date'] = today_str
-            # --------------------------------
-
-            print("\n✅ Ótimo! Entendi que o plano está pronto. Preparando para agendar...")
-            try:
-                orchestrator.schedule_with_preferences(final_preferences)
-                break
-            except Exception as e:
-                print(f"Houve um problema ao tentar agendar: {e}")
-                print("Vamos tentar refinar os detalhes.")
+            if final_preferences:
+                # Verifica se a data de início existe e, se não, usa a data de hoje como padrão.
+                if not final_preferences.get('start_date'):
+                    today_str = dt.date.today().strftime('%Y-%m-%d')
+                    print(f"⚠️ Data de início não foi especificada na conversa. Usando a data de hoje: {today_str}")
+                    final_preferences['start_date'] = today_str
+                # --------------------------------
+
+                print("\n✅ Ótimo! Entendi que o plano está pronto. Preparando para agendar...")
+                try:
+                    ics_path = args.ics or (os.path.join(OUTPUT_FOLDER, ICS_NAME) if args.dry_run else None)
+                    orchestrator.schedule_with_preferences(final_preferences, dry_run=args.dry_run, ics_path=ics_path)
+                    break
+                except Exception as e:
+                    print(f"Houve um problema ao tentar agendar: {e}")
+                    print("Vamos tentar refinar os detalhes.")
+    finally:
+        orchestrator.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,63 @@
+# tests/test_corpus_store.py (testes do armazenamento compacto das páginas)
+
+import os
+import tempfile
+import unittest
+
+from tools.corpus_store import CorpusStore, CHUNK_SEPARATOR
+
+
+class CorpusStoreTest(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.folder = os.path.join(self._tmpdir.name, 'corpus')
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_save_and_reopen_readonly(self):
+        with CorpusStore(self.folder, reset=True) as corpus:
+            first = corpus.add_page('prova.pdf', 1, 'Questão sobre normalização')
+            empty = corpus.add_page('prova.pdf', 2, '')
+            other = corpus.add_page('outra.pdf', 7, 'Redes de computadores')
+            corpus.set_label(first, 'Banco de Dados', 'Normalização')
+            corpus.set_label(other, 'Redes', 'TCP/IP')
+            corpus.save()
+
+        with CorpusStore(self.folder, readonly=True) as corpus:
+            self.assertEqual(len(corpus), 3)
+            self.assertEqual(corpus.text(first), 'Questão sobre normalização')
+            self.assertEqual(corpus.text(empty), '')
+            self.assertEqual(corpus.source(other), 'outra.pdf')
+            self.assertEqual(corpus.page(other), 7)
+            self.assertEqual(corpus.label(first), ('Banco de Dados', 'Normalização'))
+            self.assertIsNone(corpus.label(empty))
+            self.assertEqual(corpus.chunk(other), f"Fonte: outra.pdf, Página: 7{CHUNK_SEPARATOR}Redes de computadores")
+
+    def test_reads_pages_appended_after_mapping(self):
+        with CorpusStore(self.folder, reset=True) as corpus:
+            first = corpus.add_page('a.pdf', 1, 'primeira')
+            self.assertEqual(corpus.text(first), 'primeira')
+            second = corpus.add_page('a.pdf', 2, 'segunda')
+            self.assertEqual(corpus.text(second), 'segunda')
+
+    def test_lone_surrogate_does_not_stop_the_pdf(self):
+        with CorpusStore(self.folder, reset=True) as corpus:
+            broken = corpus.add_page('a.pdf', 1, 'antes \ud800 depois')
+            after = corpus.add_page('a.pdf', 2, 'próxima página')
+
+            self.assertEqual(corpus.text(broken), 'antes ? depois')
+            self.assertEqual(corpus.text(after), 'próxima página')
+
+    def test_reset_discards_previous_run(self):
+        with CorpusStore(self.folder, reset=True) as corpus:
+            corpus.add_page('a.pdf', 1, 'antiga')
+            corpus.save()
+        with CorpusStore(self.folder, reset=True) as corpus:
+            self.assertEqual(len(corpus), 0)
+        with CorpusStore(self.folder, readonly=True) as corpus:
+            self.assertEqual(len(corpus), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
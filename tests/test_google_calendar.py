@@ -0,0 +1,73 @@
+# tests/test_google_calendar.py (testes offline da criação de eventos em lote)
+
+import io
+import unittest
+import datetime as dt
+from contextlib import redirect_stdout
+
+from tools.google_calendar import CalendarManager
+from tools.study_scheduler import StudySession
+
+
+class _FakeBatch:
+    """Lote que responde às primeiras `answered` requisições e depois falha."""
+    def __init__(self, callback, answered):
+        self.callback = callback
+        self.answered = answered
+        self.request_ids = []
+
+    def add(self, request, request_id):
+        self.request_ids.append(request_id)
+
+    def execute(self):
+        for request_id in self.request_ids[:self.answered]:
+            self.callback(request_id, {}, None)
+        if self.answered < len(self.request_ids):
+            raise ConnectionError("conexão interrompida")
+
+
+class _FakeEvents:
+    def insert(self, calendarId, body):
+        return body
+
+
+class _FakeService:
+    def __init__(self, answered):
+        self.answered = answered
+
+    def events(self):
+        return _FakeEvents()
+
+    def new_batch_http_request(self, callback):
+        return _FakeBatch(callback, self.answered)
+
+
+def _sessions(n):
+    start = dt.datetime(2026, 10, 19, 19, 0)
+    return [StudySession('A', str(i), 'estudo', start, start + dt.timedelta(minutes=30), 'A.pdf', 1) for i in range(n)]
+
+
+class CreateStudyEventsTest(unittest.TestCase):
+    def _create(self, service, sessions, batch_size):
+        manager = CalendarManager.__new__(CalendarManager)
+        manager.service = service
+        output = io.StringIO()
+        with redirect_stdout(output):
+            created = manager.create_study_events(sessions, batch_size=batch_size)
+        return created, output.getvalue()
+
+    def test_all_events_created(self):
+        created, output = self._create(_FakeService(answered=10), _sessions(5), batch_size=2)
+        self.assertEqual(created, 5)
+        self.assertEqual(output, "")
+
+    def test_failed_batch_reports_only_unanswered_requests(self):
+        created, output = self._create(_FakeService(answered=3), _sessions(5), batch_size=5)
+        self.assertEqual(created, 3)
+        self.assertEqual(output.count("Erro ao tentar criar evento"), 2)
+        self.assertIn("A - 3", output)
+        self.assertNotIn("A - 0", output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# tests/test_question_index.py (testes da busca de questões com BM25)
+
+import os
+import tempfile
+import unittest
+
+from tools.question_index import QuestionIndex, tokenize
+
+
+def _index(folder):
+    index = QuestionIndex(folder, reset=True)
+    index.add_document(0, 'Questão sobre normalização de banco de dados e formas normais')
+    index.add_document(1, 'Redes de computadores: protocolo TCP e camadas do modelo OSI')
+    index.add_document(2, 'Consulta SQL com JOIN entre tabelas do banco de dados')
+    index.add_document(3, 'Normalizações: a terceira forma normal elimina dependências transitivas')
+    return index
+
+
+class TokenizeTest(unittest.TestCase):
+    def test_accents_and_plurals_are_folded(self):
+        self.assertEqual(tokenize('Normalizações'), tokenize('normalizacao'))
+        self.assertEqual(tokenize('Questões'), ['questao'])
+        self.assertEqual(tokenize('dados'), ['dado'])
+
+    def test_stopwords_and_short_tokens_are_dropped(self):
+        self.assertEqual(tokenize('ok'), [])
+        self.assertEqual(tokenize('sim, pode ser'), [])
+        self.assertEqual(tokenize('ok, só SQL'), ['sql'])
+        self.assertEqual(tokenize('a e o x'), [])
+
+
+class QuestionIndexTest(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.folder = os.path.join(self._tmpdir.name, 'corpus')
+        self.index = _index(self.folder)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def _ids(self, query, **kwargs):
+        return [doc_id for doc_id, _ in self.index.search(query, **kwargs)]
+
+    def test_document_with_query_terms_ranks_first(self):
+        self.assertEqual(self._ids('protocolo TCP'), [1])
+        self.assertEqual(set(self._ids('normalização')), {0, 3})
+        self.assertEqual(self._ids('SQL banco')[0], 2)
+
+    def test_candidates_restrict_results(self):
+        self.assertEqual(self._ids('banco de dados', candidates=[2, 3]), [2])
+
+    def test_conversational_replies_do_not_match(self):
+        self.assertEqual(self.index.search('ok'), [])
+        self.assertEqual(self.index.search('sim'), [])
+
+    def test_save_and_reload_gives_same_results(self):
+        self.index.save()
+        reloaded = QuestionIndex(self.folder)
+
+        self.assertEqual(len(reloaded), len(self.index))
+        for query in ('normalização', 'banco de dados', 'TCP'):
+            self.assertEqual(reloaded.search(query), self.index.search(query))
+
+        reloaded.add_document(4, 'Protocolo UDP sem conexão')
+        self.assertEqual(reloaded.search('UDP')[0][0], 4)
+
+    def test_reset_discards_saved_index(self):
+        self.index.save()
+        self.assertEqual(len(QuestionIndex(self.folder, reset=True)), 0)
+        self.assertEqual(len(QuestionIndex(self.folder)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
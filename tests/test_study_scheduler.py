@@ -0,0 +1,103 @@
+# tests/test_study_scheduler.py (testes offline do agendador e da exportação .ics)
+
+import os
+import tempfile
+import unittest
+import datetime as dt
+
+from tools.study_scheduler import StudyScheduler, write_ics, _ics_fold
+
+MONDAY = dt.date(2026, 10, 19)
+
+
+def _topics(n, count=3):
+    return [{'materia': 'A', 'assunto': str(i), 'filename': f'A_{i}.pdf', 'count': count} for i in range(n)]
+
+
+class StudySchedulerPlanTest(unittest.TestCase):
+    def test_sessions_do_not_overlap_and_respect_study_days(self):
+        scheduler = StudyScheduler(MONDAY, study_days=[0, 2, 4], study_time='19:00', topics_per_day=2)
+        sessions = scheduler.plan(_topics(30))
+
+        self.assertEqual(len(sessions), 30 * 4)
+        for previous, current in zip(sessions, sessions[1:]):
+            self.assertLessEqual(previous.end, current.start)
+        for s in sessions:
+            self.assertIn(s.start.weekday(), (0, 2, 4))
+            self.assertEqual(s.start.date(), s.end.date())
+            self.assertGreaterEqual(s.start.time(), dt.time(19, 0))
+            self.assertLessEqual(s.end.time(), dt.time(23, 0))
+
+    def test_priorities_come_first_and_reviews_follow_intervals(self):
+        topics = _topics(3) + [{'materia': 'B', 'assunto': 'SQL', 'filename': 'B_SQL.pdf', 'count': 1}]
+        scheduler = StudyScheduler(MONDAY, study_days=range(7), study_time='08:00', topics_per_day=1,
+                                   priorities=['B'])
+        sessions = scheduler.plan(topics)
+
+        first = min((s for s in sessions if s.kind == 'estudo'), key=lambda s: s.start)
+        self.assertEqual(first.materia, 'B')
+        reviews = sorted((s for s in sessions if s.assunto == 'SQL' and s.kind == 'revisão'), key=lambda s: s.start)
+        self.assertEqual([(s.start.date() - first.start.date()).days for s in reviews], [1, 7, 21])
+
+    def test_all_day_busy_slot_moves_session_to_next_study_day(self):
+        busy = [(dt.datetime(2026, 10, 19, 0, 0), dt.datetime(2026, 10, 20, 0, 0))]
+        scheduler = StudyScheduler(MONDAY, study_days=range(7), study_time='19:00', topics_per_day=1,
+                                   busy_slots=busy)
+        first = scheduler.plan(_topics(1))[0]
+
+        self.assertEqual(first.summary, 'Estudar: A - 0')
+        self.assertEqual(first.start, dt.datetime(2026, 10, 20, 19, 0))
+
+    def test_busy_slot_near_day_end_does_not_cross_midnight(self):
+        busy = [(dt.datetime(2026, 10, 19, 18, 0), dt.datetime(2026, 10, 19, 23, 50))]
+        scheduler = StudyScheduler(MONDAY, study_days=range(7), study_time='19:00', topics_per_day=1,
+                                   busy_slots=busy, day_end='23:59')
+        sessions = scheduler.plan(_topics(1))
+
+        for s in sessions:
+            self.assertEqual(s.start.date(), s.end.date())
+        self.assertEqual(sessions[0].start, dt.datetime(2026, 10, 20, 19, 0))
+
+    def test_session_longer_than_window_is_shortened(self):
+        scheduler = StudyScheduler(MONDAY, study_days=range(7), study_time='22:30', topics_per_day=1)
+        first = scheduler.plan(_topics(1, count=20))[0]
+
+        self.assertEqual(first.start, dt.datetime(2026, 10, 19, 22, 30))
+        self.assertEqual(first.end, dt.datetime(2026, 10, 19, 23, 0))
+
+
+class IcsExportTest(unittest.TestCase):
+    def test_fold_limits_lines_to_75_octets(self):
+        line = 'DESCRIPTION:' + 'Revisão de questões, ' * 20
+        parts = _ics_fold(line)
+
+        self.assertGreater(len(parts), 1)
+        for part in parts:
+            self.assertLessEqual(len(part.encode('utf-8')), 75)
+        for part in parts[1:]:
+            self.assertTrue(part.startswith(' '))
+        self.assertEqual(parts[0] + ''.join(p[1:] for p in parts[1:]), line)
+
+    def test_fold_keeps_short_lines(self):
+        self.assertEqual(_ics_fold('SUMMARY:Curto'), ['SUMMARY:Curto'])
+
+    def test_write_ics_converts_to_utc(self):
+        scheduler = StudyScheduler(MONDAY, study_days=range(7), study_time='19:00', topics_per_day=1)
+        sessions = scheduler.plan(_topics(2))
+        with tempfile.TemporaryDirectory() as folder:
+            path = write_ics(sessions, os.path.join(folder, 'cronograma.ics'))
+            with open(path, 'rb') as f:
+                content = f.read()
+
+        self.assertTrue(content.endswith(b'\r\n'))
+        lines = content.decode('utf-8').split('\r\n')
+        self.assertEqual(lines[0], 'BEGIN:VCALENDAR')
+        self.assertEqual(lines.count('BEGIN:VEVENT'), len(sessions))
+        # America/Manaus fica em UTC-4: 19:00 local corresponde a 23:00 UTC.
+        self.assertIn('DTSTART:20261019T230000Z', lines)
+        for line in lines:
+            self.assertLessEqual(len(line.encode('utf-8')), 75)
+
+
+if __name__ == '__main__':
+    unittest.main()
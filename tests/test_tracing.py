@@ -0,0 +1,66 @@
+# tests/test_tracing.py (testes da instrumentação leve)
+
+import logging
+import unittest
+
+from tools import tracing
+
+
+class TracingTest(unittest.TestCase):
+    def tearDown(self):
+        tracing._enabled = False
+        tracing._finished_spans.clear()
+
+    def test_disabled_span_is_shared_noop(self):
+        first = tracing.span("a", category="call", file="x.pdf")
+        second = tracing.span("b")
+
+        self.assertIs(first, second)
+        with first as current:
+            current.set(bytes_written=10)
+            current.incr("retries")
+        self.assertEqual(tracing.drain_spans(), [])
+
+    def test_spans_record_parent_and_counters(self):
+        tracing.enable()
+        with tracing.span("stage"):
+            with tracing.span("call", category="call") as call_span:
+                call_span.incr("retries")
+                call_span.incr("retries")
+
+        spans = {s.name: s for s in tracing.drain_spans()}
+        self.assertEqual(spans["call"].parent, "stage")
+        self.assertEqual(spans["call"].attrs["retries"], 2)
+        self.assertEqual(tracing.drain_spans(), [])
+
+    def test_merge_spans_from_worker(self):
+        tracing.enable()
+        with tracing.span("reportlab.build", category="call", file="A.pdf"):
+            pass
+        worker_spans = tracing.drain_spans()
+
+        tracing.merge_spans(worker_spans)
+        summary = tracing.format_summary()
+        self.assertIn("reportlab.build", summary)
+        self.assertIn("file=A.pdf", summary)
+
+    def test_merge_spans_is_ignored_when_disabled(self):
+        tracing.merge_spans([tracing.Span("x", "call", {})])
+        self.assertEqual(tracing.drain_spans(), [])
+
+    def test_count_retries_from_logger(self):
+        tracing.enable()
+        logger = logging.getLogger("tests.fake_client")
+        logger.propagate = False
+        logger.addHandler(logging.NullHandler())
+        with tracing.span("gemini.classify", category="call") as call_span:
+            with tracing.count_retries(call_span, "tests.fake_client"):
+                logger.warning("Retrying %s in %s seconds as it raised %s: %s.", "call", 2.0, "ServiceUnavailable", "503")
+                logger.warning("Outro aviso qualquer")
+
+        self.assertEqual(call_span.attrs["retries"], 1)
+        self.assertEqual(logger.handlers[-1].__class__, logging.NullHandler)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+# tools/corpus_store.py (armazenamento compacto das páginas extraídas)
+
+import os
+import json
+import mmap
+from array import array
+
+# Separador entre a origem e o texto da página, no formato usado nos prompts.
+CHUNK_SEPARATOR = '\n\n---\n\n'
+
+class CorpusStore:
+    """
+    Guarda o texto de todas as páginas em um único arquivo, apenas com acréscimos,
+    lido por mapeamento em memória (mmap).
+
+    Cada página é identificada por um inteiro (id). Os metadados ficam em arrays
+    compactos indexados por esse id — deslocamento e tamanho no arquivo de texto,
+    fonte, número da página e rótulo (assunto classificado) — em vez de uma string
+    Python por página. Assim, o restante do fluxo trabalha só com ids e o texto é
+    decodificado apenas no momento em que é usado.
+
+    Arquivos na pasta do corpus:
+        pages.txt   Texto das páginas em UTF-8, concatenado.
+        *.bin       Um arquivo por array de índice.
+        meta.json   Nomes das fontes e dos assuntos (materia, assunto).
+    """
+    _ARRAYS = {
+        'offsets': 'Q',  # Início da página em pages.txt (bytes)
+        'lengths': 'I',  # Tamanho da página em bytes
+        'sources': 'I',  # Índice em self.source_names
+        'pages': 'I',    # Número da página no PDF (a partir de 1)
+        'labels': 'i',   # Índice em self.topics, ou -1 se não classificada/irrelevante
+    }
+
+    def __init__(self, folder: str, reset: bool = False, readonly: bool = False):
+        self.folder = folder
+        self.readonly = readonly
+        self.data_path = os.path.join(folder, 'pages.txt')
+        self.meta_path = os.path.join(folder, 'meta.json')
+
+        for name, typecode in self._ARRAYS.items():
+            setattr(self, name, array(typecode))
+        self.source_names = []
+        self.topics = []
+        self._source_index = {}
+        self._topic_index = {}
+
+        if reset and not readonly:
+            os.makedirs(folder, exist_ok=True)
+            open(self.data_path, 'wb').close()
+            if os.path.exists(self.meta_path):
+                os.remove(self.meta_path)
+        elif os.path.exists(self.meta_path):
+            self._load()
+        elif not readonly:
+            os.makedirs(folder, exist_ok=True)
+            open(self.data_path, 'ab').close()
+
+        self._writer = None if readonly else open(self.data_path, 'ab')
+        self._map = None
+
+    def _load(self):
+        with open(self.meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        self.source_names = meta['sources']
+        self.topics = [tuple(topic) for topic in meta['topics']]
+        self._source_index = {name: i for i, name in enumerate(self.source_names)}
+        self._topic_index = {topic: i for i, topic in enumerate(self.topics)}
+        for name, typecode in self._ARRAYS.items():
+            values = array(typecode)
+            with open(os.path.join(self.folder, f'{name}.bin'), 'rb') as f:
+                values.frombytes(f.read())
+            setattr(self, name, values)
+
+    def save(self):
+        """Grava os índices em disco para que outros processos (ou execuções) possam abrir o corpus."""
+        self._writer.flush()
+        for name in self._ARRAYS:
+            with open(os.path.join(self.folder, f'{name}.bin'), 'wb') as f:
+                getattr(self, name).tofile(f)
+        with open(self.meta_path, 'w', encoding='utf-8') as f:
+            json.dump({'sources': self.source_names, 'topics': self.topics}, f, ensure_ascii=False)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def add_page(self, source: str, page: int, text: str) -> int:
+        """Acrescenta uma página ao corpus e retorna o seu id."""
+        source_id = self._source_index.get(source)
+        if source_id is None:
+            source_id = self._source_index[source] = len(self.source_names)
+            self.source_names.append(source)
+
+        # O pypdf pode produzir surrogates isolados, que não existem em UTF-8; eles viram '?'.
+        data = text.encode('utf-8', errors='replace')
+        page_id = len(self)
+        self.offsets.append(self._writer.tell())
+        self.lengths.append(len(data))
+        self.sources.append(source_id)
+        self.pages.append(page)
+        self.labels.append(-1)
+        self._writer.write(data)
+        return page_id
+
+    def _view(self, end: int):
+        """Garante que o mapeamento cubra o arquivo até `end`, remapeando após novos acréscimos."""
+        if self._map is None or len(self._map) < end:
+            if self._writer is not None:
+                self._writer.flush()
+            if self._map is not None:
+                self._map.close()
+            with open(self.data_path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def text(self, page_id: int) -> str:
+        """Texto da página, decodificado a partir do arquivo mapeado."""
+        start = self.offsets[page_id]
+        end = start + self.lengths[page_id]
+        if end == start:
+            return ''
+        return self._view(end)[start:end].decode('utf-8')
+
+    def source(self, page_id: int) -> str:
+        return self.source_names[self.sources[page_id]]
+
+    def page(self, page_id: int) -> int:
+        return self.pages[page_id]
+
+    def header(self, page_id: int) -> str:
+        """Identificação da origem da página, exibida nos PDFs de estudo."""
+        return f"Fonte: {self.source(page_id)}, Página: {self.pages[page_id]}"
+
+    def chunk(self, page_id: int) -> str:
+        """Página no formato de texto enviado à IA: origem, separador e conteúdo."""
+        return f"{self.header(page_id)}{CHUNK_SEPARATOR}{self.text(page_id)}"
+
+    def set_label(self, page_id: int, materia: str, assunto: str) -> int:
+        """Associa a página a um assunto e retorna o id do assunto."""
+        key = (materia, assunto)
+        topic_id = self._topic_index.get(key)
+        if topic_id is None:
+            topic_id = self._topic_index[key] = len(self.topics)
+            self.topics.append(key)
+        self.labels[page_id] = topic_id
+        return topic_id
+
+    def label(self, page_id: int):
+        """Retorna (materia, assunto) da página, ou None se ela não foi classificada."""
+        topic_id = self.labels[page_id]
+        return self.topics[topic_id] if topic_id >= 0 else None
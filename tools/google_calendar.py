@@ -1,31 +1,101 @@
 import os.path
+import json
 import datetime as dt
 from time import sleep
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from collections import Counter
+from tools import tracing
+
+# As bibliotecas do Google (google-auth, googleapiclient) são importadas apenas dentro
+# de get_calendar_service(), para que utilitários e execuções sem agenda iniciem rápido.
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
+CREDENTIALS_PATH = 'config/credentials.json'
+TOKEN_PATH = 'config/token.json'
+DISCOVERY_CACHE_PATH = 'config/calendar_v3_discovery.json'
+# Fuso dos eventos criados. Os horários sem fuso do cronograma são interpretados nele.
+DEFAULT_TIMEZONE = 'America/Manaus'
 
-class CalendarManager:
-    def __init__(self, credentials_path='config/credentials.json', token_path='config/token.json'):
-        creds = None
-        if os.path.exists(token_path):
-            creds = Credentials.from_authorized_user_file(token_path, SCOPES)
-        
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(credentials_path, SCOPES)
-                creds = flow.run_local_server(port=0)
-            
-            with open(token_path, 'w') as token:
-                token.write(creds.to_json())
+# Serviços já construídos nesta execução, indexados pelo caminho do token.
+_service_cache = {}
+
+def _load_credentials(credentials_path: str, token_path: str):
+    """
+    Carrega as credenciais salvas, renovando-as ou iniciando o fluxo de autorização se necessário.
+    """
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
+    creds = None
+    if os.path.exists(token_path):
+        creds = Credentials.from_authorized_user_file(token_path, SCOPES)
+    
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+        else:
+            flow = InstalledAppFlow.from_client_secrets_file(credentials_path, SCOPES)
+            creds = flow.run_local_server(port=0)
         
-        self.service = build('calendar', 'v3', credentials=creds)
+        with open(token_path, 'w') as token:
+            token.write(creds.to_json())
+    return creds
+
+def _load_discovery_document(cache_path: str = DISCOVERY_CACHE_PATH) -> str:
+    """
+    Retorna o documento de descoberta da Calendar API v3.
+    Usa a cópia local se existir; caso contrário, obtém o documento estático da
+    biblioteca (ou da rede, em versões antigas) e o salva para as próximas execuções.
+    """
+    if os.path.exists(cache_path):
+        with tracing.span("calendar.discovery", category="call", cache_hit=True):
+            with open(cache_path, encoding='utf-8') as f:
+                return f.read()
+
+    with tracing.span("calendar.discovery", category="call", cache_hit=False):
+        document = None
+        try:
+            from googleapiclient.discovery_cache import get_static_doc
+            document = get_static_doc('calendar', 'v3')
+        except ImportError:
+            pass
+        if document is None:
+            import httplib2
+            from googleapiclient.discovery import DISCOVERY_URI
+            _, content = httplib2.Http().request(DISCOVERY_URI.format(api='calendar', apiVersion='v3'))
+            document = content.decode('utf-8')
+            json.loads(document)  # Garante que o conteúdo baixado é um documento válido
+
+    try:
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            f.write(document)
+    except OSError as e:
+        print(f"⚠️ Não foi possível salvar o cache do documento de descoberta: {e}")
+    return document
+
+def get_calendar_service(credentials_path: str = CREDENTIALS_PATH, token_path: str = TOKEN_PATH):
+    """
+    Autentica o usuário e constrói o serviço da Calendar API a partir do documento
+    de descoberta local. O serviço é reutilizado nas chamadas seguintes da mesma execução.
+    """
+    service = _service_cache.get(token_path)
+    if service is not None:
+        return service
+
+    from googleapiclient.discovery import build_from_document
+
+    with tracing.span("calendar.auth", category="call"):
+        creds = _load_credentials(credentials_path, token_path)
+    document = _load_discovery_document()
+    with tracing.span("calendar.build", category="call"):
+        service = build_from_document(document, credentials=creds)
+
+    _service_cache[token_path] = service
+    return service
+
+class CalendarManager:
+    def __init__(self, credentials_path=CREDENTIALS_PATH, token_path=TOKEN_PATH):
+        self.service = get_calendar_service(credentials_path, token_path)
 
     def analyze_schedule_for_llm(self, start_date: dt.date, num_days: int = 14) -> str:
         """
@@ -36,11 +106,13 @@ class CalendarManager:
         time_max = dt.datetime.combine(start_date + dt.timedelta(days=num_days), dt.time.max).isoformat() + 'Z'
 
         try:
-            events_result = self.service.events().list(
-                calendarId='primary', timeMin=time_min, timeMax=time_max,
-                singleEvents=True, orderBy='startTime'
-            ).execute()
-            events = events_result.get('items', [])
+            with tracing.span("calendar.events.list", category="call") as call_span:
+                events_result = self.service.events().list(
+                    calendarId='primary', timeMin=time_min, timeMax=time_max,
+                    singleEvents=True, orderBy='startTime'
+                ).execute()
+                events = events_result.get('items', [])
+                call_span.set(items=len(events))
         except Exception as e:
             return f"Não foi possível acessar a agenda: {e}. Não há dados de horários."
 
@@ -78,7 +150,8 @@ class CalendarManager:
         time_max = dt.datetime.combine(start_date + dt.timedelta(days=num_days), dt.time.max).isoformat() + 'Z'
         body = {"timeMin": time_min, "timeMax": time_max, "items": [{"id": "primary"}]}
         try:
-            free_busy_result = self.service.freebusy().query(body=body).execute()
+            with tracing.span("calendar.freebusy.query", category="call"):
+                free_busy_result = self.service.freebusy().query(body=body).execute()
             busy_slots = free_busy_result['calendars']['primary']['busy']
         except Exception as e:
             print(f"⚠️ Não foi possível analisar a agenda: {e}. Usando horários padrão.")
@@ -105,20 +178,82 @@ class CalendarManager:
                 suggestions[block_name] = study_blocks[block_name]['suggestion']
         return suggestions if suggestions else {'Manhã': '09:00', 'Tarde': '14:00'}
 
-    def create_study_event(self, summary: str, description: str, start_datetime: dt.datetime):
-        end_datetime = start_datetime + dt.timedelta(hours=1)
-        event = {
+    def get_busy_slots(self, start_date: dt.date, num_days: int):
+        """
+        Retorna os compromissos do período como uma lista de (início, fim) sem fuso,
+        no horário de DEFAULT_TIMEZONE (o mesmo usado pelo cronograma e pelos eventos),
+        ou uma lista vazia se a agenda não puder ser consultada.
+        """
+        from zoneinfo import ZoneInfo
+
+        tz = ZoneInfo(DEFAULT_TIMEZONE)
+        time_min = dt.datetime.combine(start_date, dt.time.min, tzinfo=tz).isoformat()
+        time_max = dt.datetime.combine(start_date + dt.timedelta(days=num_days), dt.time.max, tzinfo=tz).isoformat()
+        body = {"timeMin": time_min, "timeMax": time_max, "timeZone": DEFAULT_TIMEZONE, "items": [{"id": "primary"}]}
+        try:
+            with tracing.span("calendar.freebusy.query", category="call") as call_span:
+                free_busy_result = self.service.freebusy().query(body=body).execute()
+                busy_slots = free_busy_result['calendars']['primary']['busy']
+                call_span.set(items=len(busy_slots))
+        except Exception as e:
+            print(f"⚠️ Não foi possível consultar os horários ocupados: {e}. O cronograma ignorará a agenda atual.")
+            return []
+
+        def _to_local(value: str) -> dt.datetime:
+            return dt.datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(tz).replace(tzinfo=None)
+
+        return [(_to_local(busy['start']), _to_local(busy['end'])) for busy in busy_slots]
+
+    @staticmethod
+    def _build_event(summary: str, description: str, start_datetime: dt.datetime, end_datetime: dt.datetime) -> dict:
+        return {
             'summary': summary,
             'description': description,
-            'start': {'dateTime': start_datetime.isoformat(), 'timeZone': 'America/Manaus'},
-            'end': {'dateTime': end_datetime.isoformat(), 'timeZone': 'America/Manaus'},
+            'start': {'dateTime': start_datetime.isoformat(), 'timeZone': DEFAULT_TIMEZONE},
+            'end': {'dateTime': end_datetime.isoformat(), 'timeZone': DEFAULT_TIMEZONE},
             'reminders': {'useDefault': False, 'overrides': [{'method': 'popup', 'minutes': 30}]},
             'extendedProperties': {'private': {'creator': 'study_planner_agent_v1'}}
         }
-        try:
-            self.service.events().insert(calendarId='primary', body=event).execute()
-        except Exception as e:
-            print(f"⚠️ Erro ao tentar criar evento '{summary}': {e}")
+
+    def create_study_events(self, sessions: list, batch_size: int = 50) -> int:
+        """
+        Cria vários eventos usando requisições em lote da API (até 50 por lote).
+
+        Args:
+            sessions (list): Sessões geradas pelo StudyScheduler.
+
+        Returns:
+            int: Quantidade de eventos criados com sucesso.
+        """
+        created = 0
+        failures = []
+        answered = set()
+
+        def _callback(request_id, response, exception):
+            nonlocal created
+            answered.add(request_id)
+            if exception is not None:
+                failures.append((request_id, exception))
+            else:
+                created += 1
+
+        for offset in range(0, len(sessions), batch_size):
+            chunk = sessions[offset:offset + batch_size]
+            answered.clear()
+            batch = self.service.new_batch_http_request(callback=_callback)
+            for index, session in enumerate(chunk, start=offset):
+                event = self._build_event(session.summary, session.description, session.start, session.end)
+                batch.add(self.service.events().insert(calendarId='primary', body=event), request_id=str(index))
+            try:
+                with tracing.span("calendar.events.batch_insert", category="call", events=len(chunk)):
+                    batch.execute()
+            except Exception as e:
+                # Só as requisições cuja resposta não chegou ao callback contam como falha do lote.
+                failures.extend((str(i), e) for i in range(offset, offset + len(chunk)) if str(i) not in answered)
+
+        for request_id, exception in failures:
+            print(f"⚠️ Erro ao tentar criar evento '{sessions[int(request_id)].summary}': {exception}")
+        return created
 
     def verify_events_creation(self, expected_events: list):
         """
@@ -138,11 +273,12 @@ class CalendarManager:
 
         # Busca todos os eventos criados pelo agente nesse período
         try:
-            results = self.service.events().list(
-                calendarId='primary', timeMin=time_min, timeMax=time_max,
-                privateExtendedProperty='creator=study_planner_agent_v1',
-                singleEvents=True
-            ).execute()
+            with tracing.span("calendar.events.list", category="call"):
+                results = self.service.events().list(
+                    calendarId='primary', timeMin=time_min, timeMax=time_max,
+                    privateExtendedProperty='creator=study_planner_agent_v1',
+                    singleEvents=True
+                ).execute()
             actual_events = results.get('items', [])
         except Exception as e:
             print(f"⚠️ Não foi possível verificar os eventos: {e}")
@@ -0,0 +1,6 @@
+# tools/naming.py (nomes dos arquivos gerados, sem dependências pesadas)
+
+def topic_pdf_filename(materia: str, assunto: str) -> str:
+    sanitized_materia = "".join(c for c in materia if c.isalnum() or c in (' ', '-')).rstrip()
+    sanitized_assunto = "".join(c for c in assunto if c.isalnum() or c in (' ', '-')).rstrip()
+    return f"{sanitized_materia}_{sanitized_assunto}.pdf".replace(" ", "_")
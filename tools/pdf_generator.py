@@ -1,11 +1,18 @@
 import os
 import html
 import re
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, HRFlowable
+import json
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, HRFlowable, Table, TableStyle
+from reportlab.platypus import BaseDocTemplate, PageTemplate, Frame, Flowable, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_RIGHT
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import inch
+from tools import tracing
+from tools.corpus_store import CorpusStore
+from tools.naming import topic_pdf_filename
 
 def _add_page_numbers(canvas, doc):
     canvas.saveState()
@@ -14,68 +21,290 @@ def _add_page_numbers(canvas, doc):
     canvas.drawCentredString(4.25 * inch, 0.75 * inch, page_number_text)
     canvas.restoreState()
 
-def create_topic_pdf(materia: str, assunto: str, explanation_text: str, content_chunks: list, output_folder: str):
-    sanitized_materia = "".join(c for c in materia if c.isalnum() or c in (' ', '-')).rstrip()
-    sanitized_assunto = "".join(c for c in assunto if c.isalnum() or c in (' ', '-')).rstrip()
-    filename = f"{sanitized_materia}_{sanitized_assunto}.pdf".replace(" ", "_")
-    filepath = os.path.join(output_folder, filename)
+class TopicPdfRenderer:
+    """
+    Gera os PDFs de estudo por assunto.
 
-    doc = SimpleDocTemplate(filepath, pagesize=letter, rightMargin=inch, leftMargin=inch, topMargin=inch, bottomMargin=inch)
-    story = []
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(name='Justify', alignment=TA_JUSTIFY, fontSize=11, leading=14))
-    styles.add(ParagraphStyle(name='SourceHeader', fontName='Helvetica-Bold', fontSize=10, leading=12, spaceAfter=6))
-    styles.add(ParagraphStyle(name='MainTitle', fontSize=18, leading=22, alignment=TA_CENTER, spaceAfter=10))
-    styles.add(ParagraphStyle(name='SubTitle', fontSize=14, leading=18, alignment=TA_CENTER, spaceAfter=20))
-    styles.add(ParagraphStyle(name='SectionHeader', fontName='Helvetica-Bold', fontSize=12, spaceBefore=12, spaceAfter=6))
+    Os estilos e a expressão regular das alternativas são criados uma única vez,
+    no construtor, e reaproveitados em todos os tópicos renderizados pela instância.
+    As questões são recebidas como ids de páginas e lidas do `corpus` na hora de montar o PDF.
+    """
+    def __init__(self, output_folder: str, corpus: CorpusStore):
+        self.output_folder = output_folder
+        self.corpus = corpus
+        self.alternatives_pattern = re.compile(r'\(\s*[A-Z]\s*\)')
 
+        styles = getSampleStyleSheet()
+        styles.add(ParagraphStyle(name='Justify', alignment=TA_JUSTIFY, fontSize=11, leading=14))
+        styles.add(ParagraphStyle(name='SourceHeader', fontName='Helvetica-Bold', fontSize=10, leading=12, spaceAfter=6))
+        styles.add(ParagraphStyle(name='MainTitle', fontSize=18, leading=22, alignment=TA_CENTER, spaceAfter=10))
+        styles.add(ParagraphStyle(name='SubTitle', fontSize=14, leading=18, alignment=TA_CENTER, spaceAfter=20))
+        styles.add(ParagraphStyle(name='SectionHeader', fontName='Helvetica-Bold', fontSize=12, spaceBefore=12, spaceAfter=6))
+        styles.add(ParagraphStyle(name='TocMateria', fontName='Helvetica-Bold', fontSize=11, leading=14))
+        styles.add(ParagraphStyle(name='TocAssunto', fontSize=10, leading=13, leftIndent=12))
+        styles.add(ParagraphStyle(name='TocPage', fontSize=10, leading=13, alignment=TA_RIGHT))
+        self.styles = styles
 
-    story.append(Paragraph(f"Matéria: {materia}", styles['MainTitle']))
-    story.append(Paragraph(f"Assunto: {assunto}", styles['SubTitle']))
-    
-    story.append(HRFlowable(width="100%", thickness=1, color='black'))
-    story.append(Spacer(1, 0.2 * inch))
-    story.append(Paragraph("Resumo Teórico do Assunto", styles['SectionHeader']))
-    explanation_paragraph = Paragraph(explanation_text.replace('\n', '<br/>'), styles['Justify'])
-    story.append(explanation_paragraph)
-    story.append(Spacer(1, 0.3 * inch))
+    def _format_question(self, text: str) -> str:
+        """Escapa o texto da questão e destaca o enunciado (antes da primeira alternativa) em negrito."""
+        escaped_text = html.escape(text)
 
+        match = self.alternatives_pattern.search(escaped_text)
+        if match:
+            enunciado = escaped_text[:match.start()]
+            alternativas = escaped_text[match.start():]
+            formatted_text = f"<b>{enunciado}</b><br/><br/>{alternativas}".replace('\n', '<br/>')
+        else:
+            formatted_text = escaped_text.replace('\n', '<br/>')
+        return formatted_text
 
-    story.append(HRFlowable(width="100%", thickness=2, color='black'))
-    story.append(Spacer(1, 0.2 * inch))
-    story.append(Paragraph("Questões de Provas Anteriores", styles['SectionHeader']))
-    story.append(Spacer(1, 0.1 * inch))
+    def build_story(self, materia: str, assunto: str, explanation_text: str, chunk_ids) -> list:
+        """Monta a lista de flowables de um tópico (título, resumo teórico e questões)."""
+        styles = self.styles
+        story = []
 
+        story.append(Paragraph(f"Matéria: {materia}", styles['MainTitle']))
+        story.append(Paragraph(f"Assunto: {assunto}", styles['SubTitle']))
 
-    for i, chunk in enumerate(content_chunks):
-        try:
-            parts = chunk.split('\n\n---\n\n', 1)
-            source_info = parts[0].replace("\n", " | ")
-            content_text = parts[1]
-            escaped_text = html.escape(content_text)
-            
-            split_pattern = r'\(\s*[A-Z]\s*\)'
-            text_parts = re.split(split_pattern, escaped_text, 1)
-            
-            if len(text_parts) > 1:
-                enunciado = text_parts[0]
-                match = re.search(split_pattern, escaped_text)
-                alternativas = match.group(0) + text_parts[1]
-                formatted_text = f"<b>{enunciado}</b><br/><br/>{alternativas}".replace('\n', '<br/>')
-            else:
-                formatted_text = escaped_text.replace('\n', '<br/>')
+        story.append(HRFlowable(width="100%", thickness=1, color='black'))
+        story.append(Spacer(1, 0.2 * inch))
+        story.append(Paragraph("Resumo Teórico do Assunto", styles['SectionHeader']))
+        story.append(Paragraph(explanation_text.replace('\n', '<br/>'), styles['Justify']))
+        story.append(Spacer(1, 0.3 * inch))
+
+        story.append(HRFlowable(width="100%", thickness=2, color='black'))
+        story.append(Spacer(1, 0.2 * inch))
+        story.append(Paragraph("Questões de Provas Anteriores", styles['SectionHeader']))
+        story.append(Spacer(1, 0.1 * inch))
 
-            story.append(Paragraph(source_info, styles['SourceHeader']))
-            story.append(Paragraph(formatted_text, styles['Justify']))
-            
-            if i < len(content_chunks) - 1:
+        for i, chunk_id in enumerate(chunk_ids):
+            story.append(Paragraph(self.corpus.header(chunk_id), styles['SourceHeader']))
+            story.append(Paragraph(self._format_question(self.corpus.text(chunk_id)), styles['Justify']))
+
+            if i < len(chunk_ids) - 1:
                 story.append(Spacer(1, 0.3 * inch))
                 story.append(HRFlowable(width="90%", thickness=0.5, color='grey', spaceAfter=20, hAlign='CENTER'))
                 story.append(Spacer(1, 0.2 * inch))
-        except IndexError:
-            escaped_chunk = html.escape(chunk)
-            formatted_chunk = escaped_chunk.replace('\n', '<br/>')
-            story.append(Paragraph(formatted_chunk, styles['Justify']))
+        return story
+
+    def _build(self, filepath: str, story: list, label: str):
+        doc = SimpleDocTemplate(filepath, pagesize=letter, rightMargin=inch, leftMargin=inch, topMargin=inch, bottomMargin=inch)
+        with tracing.span("reportlab.build", category="call", file=label, flowables=len(story)) as call_span:
+            doc.build(story, onFirstPage=_add_page_numbers, onLaterPages=_add_page_numbers)
+            if tracing.is_enabled():
+                call_span.set(bytes_written=os.path.getsize(filepath))
+
+    def render(self, materia: str, assunto: str, explanation_text: str, chunk_ids, filepath: str = None) -> str:
+        """
+        Renderiza um tópico em um PDF próprio e retorna o nome do arquivo.
+        Se `filepath` não for informado, o arquivo é salvo na pasta de saída.
+        """
+        filename = topic_pdf_filename(materia, assunto)
+        if filepath is None:
+            filepath = os.path.join(self.output_folder, filename)
+        self._build(filepath, self.build_story(materia, assunto, explanation_text, chunk_ids), filename)
+        return filename
+
+    def toc_story(self, title: str, entries: list) -> list:
+        """
+        Flowables das páginas de sumário. `entries` é uma lista de (matéria, assunto, página);
+        o assunto é None nas linhas que abrem uma matéria.
+        """
+        styles = self.styles
+        rows = []
+        for materia, assunto, page in entries:
+            if assunto is None:
+                rows.append([Paragraph(html.escape(materia), styles['TocMateria']), ""])
+            else:
+                rows.append([Paragraph(html.escape(assunto), styles['TocAssunto']), Paragraph(str(page), styles['TocPage'])])
+
+        story = [Paragraph(html.escape(title), styles['MainTitle']), Paragraph("Sumário", styles['SubTitle'])]
+        if rows:
+            table = Table(rows, colWidths=[5.5 * inch, 1.0 * inch])
+            table.setStyle(TableStyle([('VALIGN', (0, 0), (-1, -1), 'TOP')]))
+            story.append(table)
+        return story
+
+# Renderizador de cada processo de trabalho, criado uma vez por processo em init_render_worker().
+_worker_renderer = None
+
+def init_render_worker(output_folder: str, corpus_folder: str, trace_enabled: bool = False):
+    global _worker_renderer
+    if trace_enabled:
+        tracing.enable()
+    _worker_renderer = TopicPdfRenderer(output_folder, CorpusStore(corpus_folder, readonly=True))
+
+def render_topic_in_worker(materia: str, assunto: str, explanation_text: str, chunk_ids):
+    """
+    Renderiza um tópico no processo de trabalho. Retorna o nome do arquivo e os spans
+    medidos no processo, para que o principal os junte ao trace com tracing.merge_spans().
+    """
+    filename = _worker_renderer.render(materia, assunto, explanation_text, chunk_ids)
+    return filename, tracing.drain_spans()
+
+def create_render_pool(output_folder: str, corpus_folder: str, max_workers: int = None) -> ProcessPoolExecutor:
+    """
+    Cria um pool de processos em que cada trabalhador mantém o seu próprio
+    TopicPdfRenderer e abre o corpus em modo somente leitura. Só os ids das
+    questões são enviados aos processos, então o corpus precisa ter sido salvo
+    (CorpusStore.save) antes. Use `pool.submit(render_topic_in_worker, ...)` para renderizar.
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=init_render_worker,
+                               initargs=(output_folder, corpus_folder, tracing.is_enabled()))
+
+class _BookDocTemplate(BaseDocTemplate):
+    """
+    Documento montado aos poucos: begin(), add() para cada grupo de flowables e finish().
+    Cada grupo é desenhado assim que chega, então só os flowables do grupo atual ficam em memória.
+    O rodapé usa a numeração do documento inteiro.
+    """
+    def __init__(self, filepath: str):
+        super().__init__(filepath, pagesize=letter, rightMargin=inch, leftMargin=inch, topMargin=inch, bottomMargin=inch)
+        frame = Frame(self.leftMargin, self.bottomMargin, self.width, self.height, id='normal')
+        self.addPageTemplates([PageTemplate(id='book', frames=[frame], onPage=_add_page_numbers)])
+
+    def begin(self):
+        self._startBuild()
+        self.canv._doctemplate = self
+
+    def add(self, flowables):
+        flowables = list(flowables)
+        while flowables:
+            self.clean_hanging()
+            self.handle_flowable(flowables)
+
+    def finish(self) -> int:
+        """Fecha o documento, grava o arquivo e retorna o número de páginas."""
+        del self.canv._doctemplate
+        self._endBuild()
+        return self.canv.getPageNumber() - 1
+
+class _TopicMark(Flowable):
+    """Marcador invisível no início de um tópico: cria os marcadores do PDF e guarda a página."""
+    def __init__(self, outlines: list):
+        super().__init__()
+        self.outlines = outlines  # (título, chave, nível)
+        self.page = None
+
+    def wrap(self, available_width, available_height):
+        return 0, 0
+
+    def draw(self):
+        self.page = self.canv.getPageNumber()
+        for title, key, level in self.outlines:
+            self.canv.bookmarkPage(key)
+            self.canv.addOutlineEntry(title, key, level=level)
+
+class StudyBookWriter:
+    """
+    Gera um "caderno de estudos" único com todos os tópicos, sumário e marcadores,
+    desenhando um tópico por vez em um único documento do ReportLab.
+
+    - add_topic() desenha o tópico imediatamente em uma primeira passagem, que só
+      serve para descobrir em que página cada tópico começa; os dados do tópico
+      (explicação e ids das questões) vão para um arquivo temporário, não para a memória.
+    - close() calcula o sumário e desenha o caderno final: sumário e, em seguida,
+      os tópicos relidos do arquivo temporário, um de cada vez, com marcadores por
+      matéria e assunto e rodapé com a numeração do caderno inteiro.
+
+    Em nenhuma das passagens há mais de um tópico em flowables. O canvas do ReportLab
+    ainda guarda o conteúdo já desenhado das páginas até gravar o arquivo.
+
+    Uso:
+        with StudyBookWriter(path, renderer) as book:
+            book.add_topic(materia, assunto, explicacao, ids_das_questoes)
+    """
+    def __init__(self, filepath: str, renderer: TopicPdfRenderer, title: str = "Caderno de Estudos"):
+        self.filepath = filepath
+        self.renderer = renderer
+        self.title = title
+        self._tmpdir = tempfile.TemporaryDirectory(prefix="study_book_")
+        self._topics_path = os.path.join(self._tmpdir.name, "topics.jsonl")
+        self._topics_file = open(self._topics_path, 'w', encoding='utf-8')
+        self._entries = []  # (matéria, assunto, página inicial no corpo do caderno)
+        self._measure = _BookDocTemplate(os.path.join(self._tmpdir.name, "measure.pdf"))
+        self._measure.begin()
+
+    def _topic_flowables(self, index: int, materia: str, assunto: str, explanation_text: str, chunk_ids, mark: _TopicMark) -> list:
+        story = [PageBreak()] if index else []
+        story.append(mark)
+        story.extend(self.renderer.build_story(materia, assunto, explanation_text, chunk_ids))
+        return story
+
+    def add_topic(self, materia: str, assunto: str, explanation_text: str, chunk_ids):
+        """Acrescenta um tópico ao caderno (os tópicos de uma mesma matéria devem vir em sequência)."""
+        index = len(self._entries)
+        mark = _TopicMark([])
+        self._measure.add(self._topic_flowables(index, materia, assunto, explanation_text, chunk_ids, mark))
+        self._entries.append((materia, assunto, mark.page))
+        record = {"materia": materia, "assunto": assunto, "explanation": explanation_text, "chunk_ids": list(chunk_ids)}
+        self._topics_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _toc_entries(self, toc_pages: int) -> list:
+        entries = []
+        last_materia = None
+        for materia, assunto, page in self._entries:
+            if materia != last_materia:
+                entries.append((materia, None, toc_pages + page))
+                last_materia = materia
+            entries.append((materia, assunto, toc_pages + page))
+        return entries
+
+    def _toc_page_count(self, toc_pages: int) -> int:
+        doc = _BookDocTemplate(os.path.join(self._tmpdir.name, "toc.pdf"))
+        doc.begin()
+        doc.add(self.renderer.toc_story(self.title, self._toc_entries(toc_pages)))
+        return doc.finish()
+
+    def close(self) -> str:
+        """Desenha o caderno final (sumário e tópicos) e retorna o caminho do arquivo."""
+        try:
+            self._measure.finish()
+            self._topics_file.close()
+
+            # O número de páginas do sumário desloca a numeração dos tópicos;
+            # mede novamente até que esse número se estabilize.
+            toc_pages = 1
+            while True:
+                rendered_pages = self._toc_page_count(toc_pages)
+                if rendered_pages == toc_pages:
+                    break
+                toc_pages = rendered_pages
+
+            with tracing.span("reportlab.build_book", category="call", topics=len(self._entries)) as call_span:
+                doc = _BookDocTemplate(self.filepath)
+                doc.begin()
+                doc.add(self.renderer.toc_story(self.title, self._toc_entries(toc_pages)))
+                last_materia = None
+                with open(self._topics_path, encoding='utf-8') as f:
+                    for index, line in enumerate(f):
+                        topic = json.loads(line)
+                        outlines = []
+                        if topic["materia"] != last_materia:
+                            outlines.append((topic["materia"], f"m{index}", 0))
+                            last_materia = topic["materia"]
+                        outlines.append((topic["assunto"], f"t{index}", 1))
+                        # Index + 1: o sumário já ocupa as primeiras páginas, então todo tópico abre uma página nova.
+                        doc.add(self._topic_flowables(index + 1, topic["materia"], topic["assunto"],
+                                                      topic["explanation"], topic["chunk_ids"], _TopicMark(outlines)))
+                doc.finish()
+                if tracing.is_enabled():
+                    call_span.set(bytes_written=os.path.getsize(self.filepath))
+            return self.filepath
+        finally:
+            self.discard()
+
+    def discard(self):
+        """Abandona o caderno sem gravá-lo, removendo os arquivos temporários."""
+        self._topics_file.close()
+        self._tmpdir.cleanup()
+
+    def __enter__(self):
+        return self
 
-    doc.build(story, onFirstPage=_add_page_numbers, onLaterPages=_add_page_numbers)
-    return filename
\ No newline at end of file
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
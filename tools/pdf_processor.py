@@ -1,34 +1,40 @@
 import os
-from typing import List
 from pypdf import PdfReader
 from tqdm import tqdm
+from tools import tracing
+from tools.corpus_store import CorpusStore
 
-def extract_chunks_from_pdfs(folder_path: str) -> List[str]:
+def extract_pages_from_pdfs(folder_path: str, corpus: CorpusStore) -> range:
     """
-    Lê todos os arquivos PDF de uma pasta, extrai o texto e o divide em chunks.
+    Lê todos os arquivos PDF de uma pasta e grava o texto de cada página no corpus.
 
     Args:
         folder_path: O caminho para a pasta contendo os arquivos PDF.
+        corpus: O CorpusStore onde as páginas serão armazenadas.
 
     Returns:
-        Uma lista de strings, onde cada string é um chunk de texto (página).
+        O intervalo de ids das páginas (chunks) acrescentadas ao corpus.
     """
     print(f"🔎 Lendo e processando PDFs da pasta: {folder_path}...")
-    text_chunks = []
+    first_id = len(corpus)
     pdf_files = [f for f in os.listdir(folder_path) if f.lower().endswith('.pdf')]
 
     for filename in tqdm(pdf_files, desc="Processando PDFs"):
         file_path = os.path.join(folder_path, filename)
-        try:
-            reader = PdfReader(file_path)
-            for page_num, page in enumerate(reader.pages):
-                text = page.extract_text()
-                if text:
-                    # Adiciona contexto de origem a cada chunk
-                    source_context = f"Fonte: {filename}, Página: {page_num + 1}\n\n---\n\n{text}"
-                    text_chunks.append(source_context)
-        except Exception as e:
-            print(f"⚠️ Erro ao ler o arquivo {filename}: {e}")
-            
-    print(f"✅ Extração concluída. Total de {len(text_chunks)} páginas (chunks) processadas.")
-    return text_chunks
\ No newline at end of file
+        with tracing.span("pypdf.read", category="call", file=filename) as read_span:
+            try:
+                reader = PdfReader(file_path)
+                for page_num, page in enumerate(reader.pages):
+                    text = page.extract_text()
+                    read_span.incr("pages")
+                    if text:
+                        # A origem (arquivo e página) fica nos índices do corpus, não no texto
+                        corpus.add_page(filename, page_num + 1, text)
+                        read_span.incr("chars", len(text))
+            except Exception as e:
+                read_span.set(error=str(e))
+                print(f"⚠️ Erro ao ler o arquivo {filename}: {e}")
+
+    page_ids = range(first_id, len(corpus))
+    print(f"✅ Extração concluída. Total de {len(page_ids)} páginas (chunks) processadas.")
+    return page_ids
@@ -0,0 +1,192 @@
+# tools/question_index.py (busca de questões com índice invertido e ranking BM25)
+
+import os
+import re
+import json
+import math
+import heapq
+import unicodedata
+from array import array
+
+# Palavras muito frequentes em português que não ajudam a distinguir questões,
+# além de respostas curtas da conversa ('sim', 'ok'), que não devem disparar buscas.
+STOPWORDS = frozenset("""
+a o e as os de da do das dos em no na nos nas um uma uns umas para por pelo pela pelos pelas
+com sem que se ao aos à às é ser são foi ou nao não mais menos como sobre entre seu sua seus suas
+ele ela eles elas este esta estes estas esse essa esses essas isso isto aquele aquela qual quais
+ja já so só tambem também muito muita muitos muitas quando onde ate até mas nem lhe lhes
+sim ok certo beleza obrigado obrigada pode vamos ta tá
+""".split())
+
+_TOKEN_PATTERN = re.compile(r'[^\W_]+')
+
+
+def _fold(text: str) -> str:
+    """Minúsculas e sem acentos, para que 'Normalização' e 'normalizacao' coincidam."""
+    normalized = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in normalized if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> list:
+    """
+    Divide o texto em termos: sem acentos, sem stopwords e com uma redução simples
+    de plural ('questões' -> 'questao', 'dados' -> 'dado').
+    """
+    terms = []
+    for token in _TOKEN_PATTERN.findall(_fold(text)):
+        if len(token) < 2 or token in STOPWORDS:
+            continue
+        if token.endswith('oes') or token.endswith('aes'):
+            token = token[:-3] + 'ao'
+        elif len(token) > 4 and token.endswith('s'):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+class QuestionIndex:
+    """
+    Índice invertido persistente sobre as páginas classificadas do corpus.
+
+    Os documentos são identificados pelos mesmos ids do CorpusStore. Para cada termo,
+    a lista de postings guarda os ids dos documentos e a frequência do termo em arrays
+    compactos; o tamanho de cada documento fica em um array indexado pelo id.
+    O índice é construído aos poucos, com add_document() à medida que as páginas
+    são classificadas, e gravado na pasta do corpus com save(). Ao abrir a pasta
+    sem `reset`, o índice salvo é carregado e pode receber novos documentos.
+    """
+    def __init__(self, folder: str, reset: bool = False, k1: float = 1.5, b: float = 0.75):
+        self.folder = folder
+        self.k1 = k1
+        self.b = b
+        self.terms_path = os.path.join(folder, 'index_terms.json')
+        self._postings = {}  # termo -> (array de ids, array de frequências)
+        self.doc_lengths = array('I')
+        self.num_docs = 0
+        self.total_length = 0
+
+        if reset:
+            # Evita que um índice de outra execução seja carregado junto com um corpus novo
+            if os.path.exists(self.terms_path):
+                os.remove(self.terms_path)
+        elif os.path.exists(self.terms_path):
+            self._load()
+
+    def _load(self):
+        with open(self.terms_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        doc_ids = array('I')
+        freqs = array('I')
+        with open(os.path.join(self.folder, 'index_postings.bin'), 'rb') as f:
+            doc_ids.frombytes(f.read())
+        with open(os.path.join(self.folder, 'index_freqs.bin'), 'rb') as f:
+            freqs.frombytes(f.read())
+        with open(os.path.join(self.folder, 'index_doc_lengths.bin'), 'rb') as f:
+            self.doc_lengths.frombytes(f.read())
+
+        position = 0
+        for term, count in meta['terms']:
+            self._postings[term] = (doc_ids[position:position + count], freqs[position:position + count])
+            position += count
+        self.num_docs = meta['num_docs']
+        self.total_length = meta['total_length']
+
+    def save(self):
+        """Grava o índice em disco, ao lado do corpus."""
+        os.makedirs(self.folder, exist_ok=True)
+        terms = []
+        with open(os.path.join(self.folder, 'index_postings.bin'), 'wb') as ids_file, \
+             open(os.path.join(self.folder, 'index_freqs.bin'), 'wb') as freqs_file:
+            for term, (doc_ids, freqs) in self._postings.items():
+                doc_ids.tofile(ids_file)
+                freqs.tofile(freqs_file)
+                terms.append((term, len(doc_ids)))
+        with open(os.path.join(self.folder, 'index_doc_lengths.bin'), 'wb') as f:
+            self.doc_lengths.tofile(f)
+        # O arquivo de termos é gravado por último: ele é o que indica que há um índice completo
+        with open(self.terms_path, 'w', encoding='utf-8') as f:
+            json.dump({'num_docs': self.num_docs, 'total_length': self.total_length, 'terms': terms}, f, ensure_ascii=False)
+
+    def __len__(self) -> int:
+        return self.num_docs
+
+    def add_document(self, doc_id: int, text: str):
+        """
+        Indexa um documento. Os ids devem ser acrescentados em ordem crescente,
+        o que mantém as listas de postings ordenadas sem precisar reordená-las.
+        """
+        terms = tokenize(text)
+        if not terms:
+            return
+        counts = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array('I'), array('I'))
+            postings[0].append(doc_id)
+            postings[1].append(count)
+
+        if len(self.doc_lengths) <= doc_id:
+            self.doc_lengths.extend([0] * (doc_id + 1 - len(self.doc_lengths)))
+        self.doc_lengths[doc_id] = len(terms)
+        self.num_docs += 1
+        self.total_length += len(terms)
+
+    def idf(self, term: str) -> float:
+        """Peso BM25 do termo: alto para termos raros no índice, 0 para termos ausentes."""
+        postings = self._postings.get(term)
+        if postings is None:
+            return 0.0
+        df = len(postings[0])
+        return math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+
+    def centroid_terms(self, term_lists, n: int = 15) -> list:
+        """
+        Termos que melhor caracterizam um conjunto de documentos já tokenizados:
+        frequência total no conjunto multiplicada pelo idf no índice inteiro.
+        Termos comuns a todo o material (cabeçalhos, instruções da prova) ficam com peso baixo.
+        """
+        counts = {}
+        for terms in term_lists:
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+        weights = ((count * self.idf(term), term) for term, count in counts.items())
+        return [term for weight, term in heapq.nlargest(n, weights) if weight > 0]
+
+    def search(self, query: str, k: int = 5, candidates=None) -> list:
+        """
+        Retorna os `k` documentos mais relevantes para a consulta, pelo ranking BM25.
+
+        Args:
+            query (str): Texto livre, ex: "só SQL e normalização".
+            k (int): Quantidade máxima de resultados.
+            candidates: Conjunto opcional de ids aos quais a busca fica restrita
+                (por exemplo, as páginas de um único assunto).
+
+        Returns:
+            list: Pares (id, pontuação), do mais para o menos relevante.
+        """
+        return self.search_terms(set(tokenize(query)), k, candidates)
+
+    def search_terms(self, terms, k: int = 5, candidates=None) -> list:
+        """Como search(), mas recebe termos já normalizados por tokenize()."""
+        if not self.num_docs:
+            return []
+        average_length = self.total_length / self.num_docs
+        k1, b = self.k1, self.b
+        doc_lengths = self.doc_lengths
+        scores = {}
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            doc_ids, freqs = postings
+            idf = self.idf(term)
+            for doc_id, freq in zip(doc_ids, freqs):
+                if candidates is not None and doc_id not in candidates:
+                    continue
+                norm = k1 * (1 - b + b * doc_lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (k1 + 1) / (freq + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
@@ -0,0 +1,303 @@
+# tools/study_scheduler.py (motor de agendamento offline)
+
+import os
+import datetime as dt
+from collections import defaultdict
+from tools import tracing
+from tools.google_calendar import DEFAULT_TIMEZONE
+
+
+class StudySession:
+    """Uma sessão planejada: o estudo inicial de um assunto ou uma das suas revisões."""
+    __slots__ = ("materia", "assunto", "kind", "start", "end", "filename", "count", "review_number")
+
+    def __init__(self, materia, assunto, kind, start, end, filename=None, count=0, review_number=0):
+        self.materia = materia
+        self.assunto = assunto
+        self.kind = kind  # 'estudo' ou 'revisão'
+        self.start = start
+        self.end = end
+        self.filename = filename
+        self.count = count
+        self.review_number = review_number
+
+    @property
+    def summary(self) -> str:
+        if self.kind == 'revisão':
+            return f"Revisar ({self.review_number}ª): {self.materia} - {self.assunto}"
+        return f"Estudar: {self.materia} - {self.assunto}"
+
+    @property
+    def description(self) -> str:
+        if self.kind == 'revisão':
+            return (f"Revisão espaçada nº {self.review_number}: refaça as questões do arquivo '{self.filename}' "
+                    f"sem consultar a teoria e releia o resumo apenas nos pontos em que errar.")
+        return (f"Foco do dia: Revisar as questões e a teoria do arquivo '{self.filename}'.\n"
+                f"Este assunto apareceu {self.count} vez(es) nas provas analisadas.")
+
+
+class StudyScheduler:
+    """
+    Calcula o cronograma completo de uma vez, sem acessar o Google Calendar.
+
+    - Os assuntos priorizados vêm primeiro; o desempate é pelo número de questões.
+    - Cada dia de estudo recebe até `topics_per_day` assuntos novos.
+    - A duração de cada sessão é proporcional ao número de questões do assunto.
+    - Para cada assunto são agendadas revisões após `review_intervals` dias
+      (repetição espaçada), no primeiro dia de estudo permitido a partir dessa data.
+    - As sessões de um dia são encadeadas a partir de `study_time`, pulando os
+      intervalos ocupados (`busy_slots`); o que não couber até `day_end` passa
+      para o próximo dia de estudo.
+    """
+    def __init__(self, start_date: dt.date, study_days: list, study_time: str, topics_per_day: int,
+                 priorities: list = None, busy_slots: list = None,
+                 minutes_per_question: int = 10, min_session_minutes: int = 30, max_session_minutes: int = 120,
+                 review_intervals: tuple = (1, 7, 21), review_minutes: int = 20,
+                 break_minutes: int = 10, day_end: str = '23:00'):
+        if not study_days:
+            raise ValueError("É preciso informar ao menos um dia da semana para estudo.")
+        self.start_date = start_date
+        self.study_days = set(study_days)
+        self.study_time = dt.datetime.strptime(study_time, '%H:%M').time()
+        self.day_end = dt.datetime.strptime(day_end, '%H:%M').time()
+        self.topics_per_day = max(1, int(topics_per_day))
+        self.priorities = set(priorities or [])
+        self.minutes_per_question = minutes_per_question
+        self.min_session_minutes = min_session_minutes
+        self.max_session_minutes = max_session_minutes
+        self.review_intervals = tuple(review_intervals)
+        self.review_minutes = review_minutes
+        self.break_minutes = break_minutes
+
+        # Janela de estudo de cada dia. Se `study_time` for depois de `day_end`, o dia vai até a
+        # meia-noite. Sessões maiores que a janela são encurtadas para caber nela.
+        if self.day_end <= self.study_time:
+            self.day_end = dt.time.max
+        window = dt.datetime.combine(start_date, self.day_end) - dt.datetime.combine(start_date, self.study_time)
+        self._max_session = dt.timedelta(minutes=window // dt.timedelta(minutes=1))
+
+        # Deslocamentos (em dias) dos dias de estudo dentro da primeira semana,
+        # para achar o n-ésimo dia de estudo por aritmética, sem percorrer o calendário.
+        self._week_offsets = [d for d in range(7) if (start_date + dt.timedelta(days=d)).weekday() in self.study_days]
+
+        # Intervalos ocupados agrupados por dia e ordenados pelo início.
+        self._busy_by_day = defaultdict(list)
+        self.add_busy_slots(busy_slots or [])
+
+    @classmethod
+    def from_preferences(cls, preferences: dict, **kwargs) -> "StudyScheduler":
+        """Cria o agendador a partir do dicionário produzido pelo ConversationalPlanner."""
+        return cls(
+            start_date=dt.datetime.strptime(preferences['start_date'], '%Y-%m-%d').date(),
+            study_days=preferences['study_days'],
+            study_time=preferences['study_time'],
+            topics_per_day=preferences['topics_per_day'],
+            priorities=preferences.get('priorities', []),
+            **kwargs
+        )
+
+    def add_busy_slots(self, busy_slots: list):
+        """Registra compromissos (pares início/fim em horário local) que o cronograma deve evitar."""
+        touched = set()
+        for busy_start, busy_end in busy_slots:
+            day = busy_start.date()
+            while day <= busy_end.date():
+                self._busy_by_day[day].append((busy_start, busy_end))
+                touched.add(day)
+                day += dt.timedelta(days=1)
+        for day in touched:
+            self._busy_by_day[day].sort()
+
+    def horizon_days(self, num_topics: int) -> int:
+        """Estimativa de quantos dias o cronograma ocupa, usada para consultar a agenda."""
+        study_days_needed = -(-num_topics // self.topics_per_day)
+        weeks = -(-study_days_needed // len(self._week_offsets))
+        return 7 * weeks + max(self.review_intervals, default=0) + 7
+
+    def _nth_study_day(self, n: int) -> dt.date:
+        weeks, index = divmod(n, len(self._week_offsets))
+        return self.start_date + dt.timedelta(days=7 * weeks + self._week_offsets[index])
+
+    def _next_study_day(self, date: dt.date) -> dt.date:
+        while date.weekday() not in self.study_days:
+            date += dt.timedelta(days=1)
+        return date
+
+    def session_minutes(self, count: int) -> int:
+        """Duração da sessão de estudo, arredondada para blocos de 15 minutos."""
+        minutes = count * self.minutes_per_question
+        minutes = -(-minutes // 15) * 15
+        return max(self.min_session_minutes, min(self.max_session_minutes, minutes))
+
+    def _first_free_start(self, day: dt.date, start: dt.datetime, duration: dt.timedelta) -> dt.datetime:
+        """Primeiro horário a partir de `start` em que a sessão não colide com compromissos."""
+        intervals = self._busy_by_day.get(day)
+        if not intervals:
+            return start
+        for busy_start, busy_end in intervals:
+            if busy_end <= start:
+                continue
+            if busy_start >= start + duration:
+                break
+            start = busy_end
+        return start
+
+    @staticmethod
+    def _find(skip: dict, day: dt.date) -> dt.date:
+        """Segue os atalhos de dias lotados até o primeiro dia ainda disponível."""
+        root = day
+        while root in skip:
+            root = skip[root]
+        while day in skip and skip[day] != root:
+            skip[day], day = root, skip[day]
+        return root
+
+    def _place(self, cursors: dict, skips: dict, day: dt.date, duration: dt.timedelta):
+        """
+        Reserva a sessão no primeiro horário livre do dia (ou dos dias seguintes).
+        A sessão precisa começar no próprio dia e terminar até `day_end`; se os
+        compromissos empurrarem o início para depois disso, ela passa para o próximo dia de estudo.
+
+        Como o cursor de cada dia só avança, um dia que não comporta uma sessão de
+        certa duração nunca voltará a comportá-la. `skips[duração]` guarda atalhos
+        para o próximo dia candidato, de modo que cada dia lotado é visitado uma única vez.
+        """
+        skip = skips.setdefault(duration, {})
+        day = self._find(skip, day)
+        while True:
+            cursor = cursors.get(day) or dt.datetime.combine(day, self.study_time)
+            start = self._first_free_start(day, cursor, duration)
+            end = start + duration
+            if start.date() == day and end <= dt.datetime.combine(day, self.day_end):
+                cursors[day] = end + dt.timedelta(minutes=self.break_minutes)
+                return start, end
+            skip[day] = self._next_study_day(day + dt.timedelta(days=1))
+            day = self._find(skip, skip[day])
+
+    def plan(self, topics: list) -> list:
+        """
+        Gera todas as sessões para os tópicos informados.
+
+        Args:
+            topics (list): Dicionários com 'materia', 'assunto', 'filename' e 'count',
+                no formato de PlannerOrchestrator.topic_files_for_scheduling.
+
+        Returns:
+            list[StudySession]: As sessões ordenadas pelo horário de início.
+        """
+        with tracing.span("schedule_plan", topics=len(topics)) as plan_span:
+            study_items = sorted(
+                topics,
+                key=lambda x: (
+                    x['materia'] not in self.priorities and x['assunto'] not in self.priorities,
+                    -x['count']  # Desempate por número de questões
+                )
+            )
+
+            cursors = {}
+            skips = {}
+            sessions = []
+            review_duration = min(dt.timedelta(minutes=self.review_minutes), self._max_session)
+            for index, item in enumerate(study_items):
+                day = self._nth_study_day(index // self.topics_per_day)
+                duration = min(dt.timedelta(minutes=self.session_minutes(item['count'])), self._max_session)
+                start, end = self._place(cursors, skips, day, duration)
+                sessions.append(StudySession(item['materia'], item['assunto'], 'estudo', start, end,
+                                             item.get('filename'), item['count']))
+
+                for number, interval in enumerate(self.review_intervals, start=1):
+                    review_day = self._next_study_day(start.date() + dt.timedelta(days=interval))
+                    review_start, review_end = self._place(cursors, skips, review_day, review_duration)
+                    sessions.append(StudySession(item['materia'], item['assunto'], 'revisão', review_start, review_end,
+                                                 item.get('filename'), item['count'], number))
+
+            sessions.sort(key=lambda s: s.start)
+            plan_span.set(sessions=len(sessions))
+            return sessions
+
+
+def format_plan(sessions: list, limit: int = 20) -> str:
+    """Resumo em texto do cronograma, usado no modo de simulação."""
+    if not sessions:
+        return "Nenhuma sessão planejada."
+    studies = sum(1 for s in sessions if s.kind == 'estudo')
+    lines = [
+        f"📅 {len(sessions)} sessões planejadas ({studies} de estudo e {len(sessions) - studies} de revisão), "
+        f"de {sessions[0].start:%d/%m/%Y} a {sessions[-1].end:%d/%m/%Y}."
+    ]
+    for s in sessions[:limit]:
+        lines.append(f"  {s.start:%a %d/%m %H:%M}-{s.end:%H:%M}  {s.summary}")
+    if len(sessions) > limit:
+        lines.append(f"  ... e mais {len(sessions) - limit} sessões.")
+    return "\n".join(lines)
+
+
+def _ics_escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _ics_fold(line: str) -> list:
+    """Quebra linhas com mais de 75 bytes, como exige a RFC 5545."""
+    if len(line.encode('utf-8')) <= 75:
+        return [line]
+    parts = []
+    current = ''
+    size = 0
+    for char in line:
+        char_size = len(char.encode('utf-8'))
+        if size + char_size > 75:
+            parts.append(current)
+            # As linhas de continuação começam com um espaço.
+            current = ' '
+            size = 1
+        current += char
+        size += char_size
+    parts.append(current)
+    return parts
+
+
+def write_ics(sessions: list, filepath: str, timezone: str = DEFAULT_TIMEZONE, reminder_minutes: int = 30) -> str:
+    """
+    Exporta as sessões para um arquivo iCalendar (.ics), que pode ser importado
+    no Google Calendar, Outlook ou qualquer outro aplicativo de agenda.
+    Os horários são interpretados no fuso `timezone` e gravados em UTC.
+    """
+    from zoneinfo import ZoneInfo
+
+    tz = ZoneInfo(timezone)
+    utc = dt.timezone.utc
+    stamp = dt.datetime.now(utc).strftime('%Y%m%dT%H%M%SZ')
+
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//study_planner_agent//Cronograma de Estudos//PT',
+        'CALSCALE:GREGORIAN',
+    ]
+    for index, s in enumerate(sessions):
+        start_utc = s.start.replace(tzinfo=tz).astimezone(utc)
+        end_utc = s.end.replace(tzinfo=tz).astimezone(utc)
+        lines += [
+            'BEGIN:VEVENT',
+            f"UID:{start_utc:%Y%m%dT%H%M%SZ}-{index}@study_planner_agent",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{start_utc:%Y%m%dT%H%M%SZ}",
+            f"DTEND:{end_utc:%Y%m%dT%H%M%SZ}",
+            f"SUMMARY:{_ics_escape(s.summary)}",
+            f"DESCRIPTION:{_ics_escape(s.description)}",
+            'BEGIN:VALARM',
+            'ACTION:DISPLAY',
+            f"DESCRIPTION:{_ics_escape(s.summary)}",
+            f"TRIGGER:-PT{reminder_minutes}M",
+            'END:VALARM',
+            'END:VEVENT',
+        ]
+    lines.append('END:VCALENDAR')
+
+    with tracing.span("ics.write", category="call", sessions=len(sessions)) as call_span:
+        with open(filepath, 'w', encoding='utf-8', newline='') as f:
+            for line in lines:
+                f.write('\r\n'.join(_ics_fold(line)) + '\r\n')
+        if tracing.is_enabled():
+            call_span.set(bytes_written=os.path.getsize(filepath))
+    return filepath
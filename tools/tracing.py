@@ -0,0 +1,294 @@
+# tools/tracing.py (instrumentação leve do fluxo de execução)
+
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+import datetime as dt
+from collections import defaultdict
+
+# Estado global do rastreador. Desabilitado por padrão: nesse modo `span()` devolve
+# um objeto nulo compartilhado e nenhuma medição é registrada.
+_enabled = False
+_lock = threading.Lock()
+_local = threading.local()
+_finished_spans = []
+_run_started_at = None
+
+
+class Span:
+    """
+    Um intervalo medido do fluxo (uma etapa ou uma chamada externa).
+
+    Atributos livres (tokens, bytes gravados, acertos de cache, tentativas...)
+    ficam em `attrs` e são exportados junto com a latência.
+    """
+    __slots__ = ("name", "category", "attrs", "parent", "depth", "start", "end")
+
+    def __init__(self, name: str, category: str, attrs: dict):
+        self.name = name
+        self.category = category
+        self.attrs = attrs
+        self.parent = None
+        self.depth = 0
+        self.start = 0.0
+        self.end = 0.0
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def set(self, **attrs):
+        """Define (ou sobrescreve) atributos do span."""
+        self.attrs.update(attrs)
+
+    def incr(self, key: str, amount: int = 1):
+        """Soma `amount` a um contador numérico do span."""
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+    def __enter__(self):
+        stack = _get_stack()
+        if stack:
+            self.parent = stack[-1].name
+            self.depth = len(stack)
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.attrs["error"] = f"{exc_type.__name__}: {exc}"
+        stack = _get_stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        with _lock:
+            _finished_spans.append(self)
+        return False
+
+
+class _NoopSpan:
+    """Span nulo usado quando a instrumentação está desligada."""
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def incr(self, key: str, amount: int = 1):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _get_stack() -> list:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def enable():
+    """
+    Liga a coleta de spans para a execução atual.
+    Descarta spans herdados, o que importa nos processos de trabalho criados por fork.
+    """
+    global _enabled, _run_started_at
+    _enabled = True
+    _run_started_at = dt.datetime.now()
+    _local.stack = []
+    with _lock:
+        _finished_spans.clear()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def span(name: str, category: str = "stage", **attrs):
+    """
+    Abre um span como gerenciador de contexto.
+
+    Categorias usadas no projeto: 'stage' (fases do fluxo), 'topic' (um assunto
+    completo) e 'call' (chamadas externas: Gemini, Google Calendar, pypdf, ReportLab).
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, category, attrs)
+
+
+def drain_spans() -> list:
+    """
+    Remove e devolve os spans finalizados até agora. Usado pelos processos de
+    trabalho para devolver as suas medições ao processo principal.
+    """
+    with _lock:
+        spans = list(_finished_spans)
+        _finished_spans.clear()
+    return spans
+
+
+def merge_spans(spans: list, into=None):
+    """
+    Acrescenta spans medidos em outro processo. Os tempos vêm de time.perf_counter(),
+    que é um relógio monotônico do sistema, então ficam na mesma escala do trace local.
+
+    Se `into` for informado (ex: o span do tópico cujo PDF foi renderizado no outro
+    processo), os spans passam a ser filhos dele e a duração deles é somada à sua.
+    """
+    if not _enabled or not spans:
+        return
+    if isinstance(into, Span):
+        for s in spans:
+            if s.parent is None:  # span de nível mais alto no outro processo
+                s.parent = into.name
+                into.end += s.duration
+            s.depth += into.depth + 1
+    with _lock:
+        _finished_spans.extend(spans)
+
+
+class _RetryCounter(logging.Handler):
+    """
+    Conta as novas tentativas registradas pelo tenacity (before_sleep_log) em um logger.
+    Só considera mensagens da thread que abriu o span.
+    """
+    def __init__(self, current_span, forward_to_last_resort: bool):
+        super().__init__(logging.WARNING)
+        self.span = current_span
+        self.thread = threading.get_ident()
+        self.forward_to_last_resort = forward_to_last_resort
+
+    def emit(self, record):
+        if record.thread == self.thread and record.getMessage().startswith("Retrying"):
+            self.span.incr("retries")
+        # Sem outros handlers, o logging exibiria o aviso pelo lastResort; mantém esse comportamento.
+        if self.forward_to_last_resort and logging.lastResort is not None and record.levelno >= logging.lastResort.level:
+            logging.lastResort.handle(record)
+
+
+@contextmanager
+def count_retries(current_span, logger_name: str):
+    """
+    Registra em `retries` do span as novas tentativas que uma biblioteca faz
+    internamente e anuncia no seu logger (ex: o LangChain do Gemini, via tenacity).
+    Não altera a política de tentativas; com a instrumentação desligada, não faz nada.
+    """
+    if not _enabled:
+        yield
+        return
+    logger = logging.getLogger(logger_name)
+    handler = _RetryCounter(current_span, forward_to_last_resort=not logger.hasHandlers())
+    logger.addHandler(handler)
+    try:
+        yield
+    finally:
+        logger.removeHandler(handler)
+
+
+def _span_to_dict(s: Span) -> dict:
+    return {
+        "name": s.name,
+        "category": s.category,
+        "parent": s.parent,
+        "depth": s.depth,
+        "start_ms": round(s.start * 1000, 3),
+        "duration_ms": round(s.duration * 1000, 3),
+        "attrs": s.attrs,
+    }
+
+
+def export_trace(output_folder: str) -> str:
+    """
+    Grava todos os spans finalizados em um arquivo JSON e retorna o caminho.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    started = _run_started_at or dt.datetime.now()
+    filepath = os.path.join(output_folder, f"trace_{started.strftime('%Y%m%d_%H%M%S')}.json")
+
+    with _lock:
+        spans = sorted(_finished_spans, key=lambda s: s.start)
+    origin = spans[0].start if spans else 0.0
+
+    payload = {
+        "run_started_at": started.isoformat(),
+        "totals": _aggregate(spans),
+        "spans": [],
+    }
+    for s in spans:
+        entry = _span_to_dict(s)
+        entry["start_ms"] = round((s.start - origin) * 1000, 3)
+        payload["spans"].append(entry)
+
+    with open(filepath, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2, default=str)
+    return filepath
+
+
+def _aggregate(spans: list) -> dict:
+    """Agrupa os spans por nome: contagem, tempo total/máximo e contadores numéricos."""
+    totals = defaultdict(lambda: {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+    for s in spans:
+        entry = totals[s.name]
+        ms = s.duration * 1000
+        entry["count"] += 1
+        entry["total_ms"] += ms
+        entry["max_ms"] = max(entry["max_ms"], ms)
+        for key, value in s.attrs.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                entry[key] = entry.get(key, 0) + value
+            elif value is True:
+                entry[key] = entry.get(key, 0) + 1
+    for entry in totals.values():
+        entry["total_ms"] = round(entry["total_ms"], 3)
+        entry["max_ms"] = round(entry["max_ms"], 3)
+    return dict(totals)
+
+
+def format_summary(top_n: int = 10) -> str:
+    """
+    Monta uma tabela em texto com as etapas, os tópicos e as chamadas mais lentas.
+    """
+    with _lock:
+        spans = list(_finished_spans)
+    if not spans:
+        return "Nenhum span registrado."
+
+    lines = ["\n" + "=" * 50, "⏱️  RESUMO DE DESEMPENHO ⏱️", "=" * 50]
+
+    def _section(title, items):
+        lines.append(f"\n{title}")
+        lines.append(f"  {'tempo (s)':>10}  nome")
+        for s in items:
+            extras = ", ".join(
+                f"{k}={v}" for k, v in s.attrs.items() if k in ("file", "topic", "questions", "prompt_tokens", "response_tokens", "bytes_written", "retries", "cache_hit", "error")
+            )
+            lines.append(f"  {s.duration:>10.2f}  {s.name}" + (f"  ({extras})" if extras else ""))
+
+    stages = [s for s in spans if s.category == "stage"]
+    topics = sorted((s for s in spans if s.category == "topic"), key=lambda s: s.duration, reverse=True)[:top_n]
+    calls = sorted((s for s in spans if s.category == "call"), key=lambda s: s.duration, reverse=True)[:top_n]
+
+    if stages:
+        _section("Etapas:", sorted(stages, key=lambda s: s.start))
+    if topics:
+        _section(f"Top {len(topics)} tópicos mais lentos:", topics)
+    if calls:
+        _section(f"Top {len(calls)} chamadas mais lentas:", calls)
+
+    lines.append("\nTotais por tipo de chamada:")
+    lines.append(f"  {'qtd':>5}  {'total (s)':>10}  {'máx (s)':>8}  nome")
+    call_totals = _aggregate([s for s in spans if s.category == "call"])
+    for name, entry in sorted(call_totals.items(), key=lambda kv: kv[1]["total_ms"], reverse=True):
+        lines.append(f"  {entry['count']:>5}  {entry['total_ms'] / 1000:>10.2f}  {entry['max_ms'] / 1000:>8.2f}  {name}")
+
+    lines.append("=" * 50)
+    return "\n".join(lines)